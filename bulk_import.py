@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Bulk import of historical attack dumps
+Loads NDJSON, JSON (the server's /export output) or CSV dumps, plain or
+gzipped, straight into the database without going through HTTP.
+Records are read in batches: each batch is classified with one batched
+feature extraction and model pass (in a process pool with --workers), chained
+with one lock acquisition, and written with executemany in a single
+transaction together with its search-index rows, its blocks and the import
+checkpoint, so an interrupted import resumes after the last committed batch.
+Each run chains into its own segment starting at a fresh genesis block. The
+server never loads that segment, so the blocks are kept in the import_blocks
+table; --verify recomputes their hashes and links.
+"""
+
+import argparse
+import csv
+import gzip
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import interning
+import server_enhanced
+from search import index_attacks
+
+ATTACK_FIELDS = ('device_id', 'timestamp', 'attack_type', 'source_ip', 'path', 'payload')
+
+_worker_model = None
+_worker_features = False
+
+
+def _init_worker(model_path, want_features, enrichment_dir):
+    global _worker_model, _worker_features
+    _worker_features = want_features
+    # Spawned workers start with an empty enricher; features must match what the server computes
+    server_enhanced.load_ip_enrichment(enrichment_dir)
+    if model_path:
+        import joblib
+        _worker_model = joblib.load(model_path)
+
+
+def _classify_batch(attacks):
+    """Worker: returns (labels, confidences, feature matrix or None) for a batch of normalized attacks"""
+    if not attacks:
+        # A batch of only skipped records still advances the checkpoint; there is nothing to classify
+        return [], [], None
+    X = None
+    if _worker_model is not None or _worker_features:
+        X = server_enhanced.extract_features_batch(attacks)
+    if _worker_model is None:
+        return [server_enhanced.fallback_classification(attack) for attack in attacks], [0.5] * len(attacks), X
+    labels, confidences = server_enhanced.predict_batch(_worker_model, X)
+    return [str(label) for label in labels], [float(conf) for conf in confidences], X
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith('.json'):
+        return 'json'
+    return 'ndjson'
+
+
+def open_dump(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def iter_records(path, fmt):
+    """Yield one item per input record (None for a line that does not parse), in file order"""
+    with open_dump(path) as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        elif fmt == 'json':
+            data = json.load(f)
+            yield from (data.get('attacks') or []) if isinstance(data, dict) else data
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    yield None
+                    continue
+                # A one-line /export document is a container, not a record
+                if isinstance(record, dict) and isinstance(record.get('attacks'), list):
+                    yield from record['attacks']
+                else:
+                    yield record
+
+
+EPOCH_MILLIS_THRESHOLD = 1e11  # Larger epochs are milliseconds (1e11 seconds is the year 5138)
+
+
+def normalize_created_at(value):
+    """SQLite CURRENT_TIMESTAMP form (UTC) of an ISO-8601 string or epoch seconds/milliseconds; None if unparseable"""
+    if value is None or value == '':
+        return None
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        seconds = None
+    try:
+        if seconds is not None:
+            if abs(seconds) > EPOCH_MILLIS_THRESHOLD:
+                seconds /= 1000
+            parsed = datetime.fromtimestamp(seconds, timezone.utc)
+        else:
+            parsed = datetime.fromisoformat(str(value).strip())
+    except (OverflowError, OSError, ValueError, TypeError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def normalize(record, field_map):
+    """Map a dump record onto the /attack fields; returns (attack_data, created_at) or None if unusable"""
+    if not isinstance(record, dict):
+        return None
+    attack = {}
+    for field in ATTACK_FIELDS:
+        value = record.get(field_map.get(field, field))
+        if value is None or value == '':
+            continue
+        if field == 'timestamp':
+            try:
+                value = int(float(value))
+            except (TypeError, ValueError):
+                continue
+        else:
+            value = str(value)
+        attack[field] = value
+    if not any(field in attack for field in ('source_ip', 'path', 'payload')):
+        return None
+    raw_created_at = record.get(field_map.get('created_at', 'created_at'))
+    created_at = normalize_created_at(raw_created_at)
+    if created_at is None and raw_created_at not in (None, ''):
+        # Stamping it with the import time would file the row under the wrong partition
+        return None
+    return attack, created_at
+
+
+def init_checkpoints(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            source TEXT PRIMARY KEY,
+            records INTEGER,
+            imported INTEGER,
+            skipped INTEGER,
+            head_hash TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # data is the exact JSON the block hash covers, so the segment can be re-verified offline
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS import_blocks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run INTEGER,
+            chain TEXT,
+            block_index INTEGER,
+            timestamp REAL,
+            data TEXT,
+            previous_hash TEXT,
+            hash TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_import_blocks_hash ON import_blocks(hash)')
+    conn.commit()
+
+
+def next_run(conn):
+    return conn.execute('SELECT COALESCE(MAX(run), 0) + 1 FROM import_blocks').fetchone()[0]
+
+
+def insert_blocks(cursor, rows):
+    cursor.executemany('''
+        INSERT INTO import_blocks (run, chain, block_index, timestamp, data, previous_hash, hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+
+def verify_import_blocks(conn):
+    """Recompute every stored import block; returns a list of (run, chain, block_index, problem)"""
+    problems = []
+    previous = {}
+    for run, chain, index, timestamp, data, previous_hash, block_hash in conn.execute('''
+        SELECT run, chain, block_index, timestamp, data, previous_hash, hash
+        FROM import_blocks ORDER BY run, chain, block_index
+    '''):
+        block = server_enhanced.Block(index, timestamp, json.loads(data), previous_hash, serialized_data=data)
+        if block.hash != block_hash:
+            problems.append((run, chain, index, 'hash mismatch'))
+        expected = previous.get((run, chain))
+        if expected is None and index != 0:
+            problems.append((run, chain, index, 'segment does not start at genesis'))
+        elif expected is not None and (index != expected[0] + 1 or previous_hash != expected[1]):
+            problems.append((run, chain, index, 'broken link'))
+        previous[(run, chain)] = (index, block_hash)
+    return problems
+
+
+def load_checkpoint(conn, source):
+    row = conn.execute('SELECT records, imported, skipped, head_hash FROM import_checkpoints WHERE source = ?',
+                       (source,)).fetchone()
+    return row if row else (0, 0, 0, None)
+
+
+def write_batch(conn, attacks, created, results, blocks, block_rows, version, checkpoint):
+    """Insert one batch, its chain blocks and the checkpoint in one transaction; returns the new attack ids"""
+    labels, confidences, _ = results
+    interned = server_enhanced.STORAGE_MODE == 'interned'
+    enricher = server_enhanced.ip_enricher
+    pending = []
+    with conn:
+        cursor = conn.cursor()
+        rows = []
+        for attack, created_at, label, confidence, block in zip(attacks, created, labels, confidences, blocks):
+            path, payload = attack.get('path'), attack.get('payload')
+            path_id = payload_id = None
+            if interned:
+                path_id = server_enhanced.interner.intern_path(cursor, path, pending)
+                payload_id = server_enhanced.interner.intern_payload(cursor, payload, pending)
+                path = payload = None
+            enrichment = enricher.lookup(attack.get('source_ip', '0.0.0.0'))
+            rows.append((
+                attack.get('device_id'), attack.get('timestamp'), attack.get('attack_type'),
+                attack.get('source_ip'), path, payload, block.hash, created_at,
+                label, confidence, version, path_id, payload_id,
+                enrichment['ip_scope'], enrichment['asn'], enrichment['as_org'],
+                ','.join(enrichment['threat_lists']) or None
+            ))
+        cursor.executemany('''
+            INSERT INTO attacks (device_id, timestamp, attack_type, source_ip, path, payload, block_hash,
+                                 created_at, ml_classification, ml_confidence, model_version, path_id, payload_id,
+                                 ip_scope, asn, as_org, threat_lists)
+            VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+        # The whole batch is inserted under one write lock, so its AUTOINCREMENT ids are consecutive
+        last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+        attack_ids = list(range(last_id - len(rows) + 1, last_id + 1))
+        if server_enhanced.search_enabled:
+            index_attacks(cursor, [(attack_id, attack.get('path'), attack.get('payload'))
+                                   for attack_id, attack in zip(attack_ids, attacks)])
+
+        insert_blocks(cursor, block_rows)
+        cursor.execute('''
+            INSERT INTO import_checkpoints (source, records, imported, skipped, head_hash, updated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(source) DO UPDATE SET records = excluded.records, imported = excluded.imported,
+                skipped = excluded.skipped, head_hash = excluded.head_hash, updated_at = CURRENT_TIMESTAMP
+        ''', checkpoint)
+    server_enhanced.interner.remember(pending)
+    return attack_ids
+
+
+def iter_batches(records, batch_size, field_map):
+    """Yield (attacks, created_at values, records consumed, records skipped) per batch"""
+    attacks, created, consumed, skipped = [], [], 0, 0
+    for record in records:
+        consumed += 1
+        normalized = normalize(record, field_map)
+        if normalized is None:
+            skipped += 1
+        else:
+            attacks.append(normalized[0])
+            created.append(normalized[1])
+        if len(attacks) >= batch_size:
+            yield attacks, created, consumed, skipped
+            attacks, created, consumed, skipped = [], [], 0, 0
+    if attacks or consumed:
+        yield attacks, created, consumed, skipped
+
+
+class Importer:
+    """Chains and writes classified batches in input order, tracking progress and stage timings"""
+
+    def __init__(self, conn, source, version, feature_store, checkpoint):
+        self.conn = conn
+        self.run = next_run(conn)
+        self.persisted = {}  # chain name -> blocks already written to import_blocks
+        self.source = source
+        self.version = version
+        self.feature_store = feature_store
+        self.records, self.imported, self.skipped, _ = checkpoint
+        self.head_hash = None
+        self.started = time.time()
+        self.timings = {'classify': 0.0, 'chain': 0.0, 'write': 0.0}
+        self.new_imported = 0
+
+    def unpersisted_blocks(self):
+        """import_blocks rows for everything appended to the global and device chains since the last write"""
+        chains = [('global', server_enhanced.blockchain)]
+        chains += [(f"device:{device_id}", chain) for device_id, chain in list(server_enhanced.device_chains.items())]
+        rows = []
+        for name, chain in chains:
+            start = self.persisted.get(name, 0)
+            rows.extend((self.run, name, block.index, block.timestamp, json.dumps(block.data, sort_keys=True),
+                         block.previous_hash, block.hash) for block in chain[start:])
+            self.persisted[name] = len(chain)
+        return rows
+
+    def flush_blocks(self):
+        """Write blocks appended outside a batch (the closing anchor)"""
+        rows = self.unpersisted_blocks()
+        if rows:
+            with self.conn:
+                insert_blocks(self.conn.cursor(), rows)
+
+    def commit(self, attacks, created, consumed, skipped, results):
+        started = time.perf_counter()
+        block_data = []
+        for attack, label in zip(attacks, results[0]):
+            attack['ml_classification'] = label
+            block_data.append(interning.intern_block_data(attack)
+                              if server_enhanced.STORAGE_MODE == 'interned' else attack)
+        blocks = server_enhanced.add_blocks(block_data)
+        if blocks:
+            self.head_hash = blocks[-1].hash
+        self.timings['chain'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        self.records += consumed
+        self.imported += len(attacks)
+        self.skipped += skipped
+        checkpoint = (self.source, self.records, self.imported, self.skipped, self.head_hash)
+        attack_ids = write_batch(self.conn, attacks, created, results, blocks, self.unpersisted_blocks(),
+                                 self.version, checkpoint)
+        if self.feature_store is not None and attack_ids:
+            self.feature_store.append_many(attack_ids, results[2])
+        self.timings['write'] += time.perf_counter() - started
+        self.new_imported += len(attacks)
+
+        elapsed = time.time() - self.started
+        print(f"   • {self.records} records read, {self.imported} imported, {self.skipped} skipped"
+              f" - {self.new_imported / elapsed if elapsed else 0:.0f} rows/sec")
+
+
+def load_model_version(model_path):
+    """(path, version) of a usable model, or (None, 'fallback') when it cannot be loaded"""
+    try:
+        import joblib
+        model = joblib.load(model_path)
+        mismatch = server_enhanced.model_feature_mismatch(model)
+        if mismatch:
+            raise SystemExit(f"❌ Cannot import with {model_path}: {mismatch}")
+        return model_path, f"{model['model_name']}@{server_enhanced.model_file_version(model_path)}"
+    except Exception as e:
+        print(f"⚠️  Could not load model {model_path} ({e}); using fallback classification")
+        return None, 'fallback'
+
+
+def bulk_import(path, db_path, model_path, fmt=None, batch_size=5000, workers=1, field_map=None,
+                features=False, reset=False):
+    fmt = fmt or detect_format(path)
+    field_map = field_map or {}
+    source = os.path.abspath(path)
+
+    server_enhanced.DATABASE_PATH = db_path
+    server_enhanced.init_database()
+    enrichment_dir = os.path.abspath(server_enhanced.ENRICHMENT_DIR)
+    server_enhanced.load_ip_enrichment(enrichment_dir)
+    model_path, version = load_model_version(model_path)
+
+    conn = interning.connect(db_path)
+    init_checkpoints(conn)
+    if reset:
+        conn.execute('DELETE FROM import_checkpoints WHERE source = ?', (source,))
+        conn.commit()
+    checkpoint = load_checkpoint(conn, source)
+
+    feature_store = None
+    if features:
+        from feature_store import FeatureStore
+        prefix = server_enhanced.FEATURE_STORE_PREFIX or 'features'
+        if server_enhanced.ENRICHMENT_FEATURES:
+            prefix = f"{prefix}_enriched"
+        feature_store = FeatureStore(prefix, n_features=server_enhanced.N_FEATURES)
+
+    # The import gets its own chain segment, linked to the head of the run it resumes
+    server_enhanced.blockchain.append(server_enhanced.create_genesis_block())
+    server_enhanced.append_block(server_enhanced.blockchain, server_enhanced.chain_lock, {
+        'type': 'import', 'source': os.path.basename(path), 'format': fmt,
+        'resumed_after_record': checkpoint[0], 'previous_head': checkpoint[3]
+    })
+
+    importer = Importer(conn, source, version, feature_store, checkpoint)
+    print(f"📥 Importing {path} ({fmt}) into {db_path} with {version}"
+          f" ({workers} worker{'s' if workers != 1 else ''}, batches of {batch_size})")
+    if checkpoint[0]:
+        print(f"↩️  Resuming after record {checkpoint[0]} ({checkpoint[1]} already imported)")
+
+    records = itertools.islice(iter_records(path, fmt), checkpoint[0], None)
+    batches = iter_batches(records, batch_size, field_map)
+    want_features = feature_store is not None
+    if workers <= 1:
+        _init_worker(model_path, want_features, enrichment_dir)
+        for attacks, created, consumed, skipped in batches:
+            started = time.perf_counter()
+            results = _classify_batch(attacks)
+            importer.timings['classify'] += time.perf_counter() - started
+            importer.commit(attacks, created, consumed, skipped, results)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_path, want_features, enrichment_dir)) as pool:
+            # Batches are committed in submission order so chain order and the checkpoint follow the file
+            pending = deque()
+            for attacks, created, consumed, skipped in batches:
+                pending.append((attacks, created, consumed, skipped, pool.submit(_classify_batch, attacks)))
+                if len(pending) >= workers * 2:
+                    _commit_next(importer, pending)
+            while pending:
+                _commit_next(importer, pending)
+
+    if server_enhanced.CHAIN_MODE == 'device':
+        server_enhanced.anchor_device_chains()
+    importer.flush_blocks()
+    if feature_store is not None:
+        feature_store.close()
+    conn.close()
+
+    elapsed = time.time() - importer.started
+    rate = importer.new_imported / elapsed if elapsed else 0
+    print(f"✅ Imported {importer.new_imported} attacks in {elapsed:.1f}s ({rate:.0f} rows/sec);"
+          f" {importer.skipped} records skipped in total")
+    print("⏱️  " + ', '.join(f"{stage} {seconds:.1f}s" for stage, seconds in importer.timings.items()))
+    print(f"⛓️  Chain head {server_enhanced.blockchain[-1].hash[:16]}… ({server_enhanced.chain_block_count()} blocks,"
+          f" stored as import run {importer.run})")
+    return importer.new_imported
+
+
+def _commit_next(importer, pending):
+    attacks, created, consumed, skipped, future = pending.popleft()
+    started = time.perf_counter()
+    results = future.result()
+    importer.timings['classify'] += time.perf_counter() - started  # Time spent waiting on workers
+    importer.commit(attacks, created, consumed, skipped, results)
+
+
+def parse_field_map(pairs):
+    field_map = {}
+    for pair in pairs or []:
+        field, _, column = pair.partition('=')
+        if field not in ATTACK_FIELDS + ('created_at',) or not column:
+            raise argparse.ArgumentTypeError(f"Bad --field {pair!r}; expected FIELD=COLUMN with FIELD one of "
+                                             f"{', '.join(ATTACK_FIELDS + ('created_at',))}")
+        field_map[field] = column
+    return field_map
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import historical attack dumps (NDJSON, JSON or CSV)')
+    parser.add_argument('dump', nargs='?', help='Dump file (.ndjson/.jsonl, .json, .csv; optionally .gz)')
+    parser.add_argument('--db', default=server_enhanced.DATABASE_PATH, help='SQLite database path')
+    parser.add_argument('--model', default=server_enhanced.MODEL_PATH, help='Model file to classify with')
+    parser.add_argument('--format', choices=['ndjson', 'json', 'csv'], help='Input format (default: from extension)')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Records per batch/transaction')
+    parser.add_argument('--workers', type=int, default=1, help='Classification processes (1 = in-process)')
+    parser.add_argument('--field', action='append', metavar='FIELD=COLUMN',
+                        help='Read FIELD from COLUMN in the dump, e.g. --field source_ip=src_ip (repeatable)')
+    parser.add_argument('--features', action='store_true', help='Also append feature vectors to the feature store')
+    parser.add_argument('--reset', action='store_true', help='Ignore the checkpoint and import from the start')
+    parser.add_argument('--verify', action='store_true', help='Recompute the stored import blocks and exit')
+    args = parser.parse_args()
+
+    if args.verify:
+        conn = interning.connect(args.db)
+        init_checkpoints(conn)
+        problems = verify_import_blocks(conn)
+        count = conn.execute('SELECT COUNT(*) FROM import_blocks').fetchone()[0]
+        conn.close()
+        for run, chain, index, problem in problems[:20]:
+            print(f"❌ run {run} {chain} block #{index}: {problem}")
+        print(f"{'❌' if problems else '✅'} {count} import blocks checked, {len(problems)} problems")
+        sys.exit(1 if problems else 0)
+    if not args.dump:
+        parser.error('a dump file is required unless --verify is given')
+
+    try:
+        field_map = parse_field_map(args.field)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    try:
+        bulk_import(args.dump, args.db, args.model, args.format, args.batch_size, args.workers,
+                    field_map, args.features, args.reset)
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrupted - rerun the same command to resume from the last committed batch")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
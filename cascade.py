@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Confidence-gated rule/ML classification cascade
+High-precision signatures, tightened from fallback_classification, label the
+blatant events (stacked SQLi, credential stuffing, script tags) without
+feature extraction or the ensemble. Events that match no signature strongly
+enough, or that match signatures of more than one attack type, go to the ML
+path. Run this module directly for an offline accuracy/latency comparison of
+the cascade against ML-only classification on stored attacks.
+"""
+
+import argparse
+import threading
+import time
+
+SIGNATURE_VERSION = 1
+RULES_VERSION = f"rules@v{SIGNATURE_VERSION}"
+
+# label -> (fields searched, {pattern: weight}); weights combine noisy-or style,
+# so one decisive pattern or several weaker ones can clear the threshold
+SIGNATURES = {
+    'sql_injection': (('payload',), {
+        'union select': 0.95, 'or 1=1': 0.95, "' or '": 0.9, "' or 1": 0.9, '; drop table': 0.95,
+        'select ': 0.5, 'insert ': 0.4, 'union': 0.4, '--': 0.3
+    }),
+    'xss_attack': (('payload', 'path'), {
+        '<script': 0.95, 'javascript:': 0.9, 'onerror=': 0.9, 'onload=': 0.85, 'alert(': 0.5
+    }),
+    'command_injection': (('payload',), {
+        '; cat ': 0.9, '&& rm': 0.9, '| nc ': 0.9, '; wget ': 0.9, '`': 0.4, 'system(': 0.6, 'exec(': 0.6
+    }),
+    'directory_traversal': (('path', 'payload'), {
+        'etc/passwd': 0.95, 'boot.ini': 0.95, '../../': 0.9, '..%2f': 0.9, '../': 0.6
+    }),
+    'brute_force_credential': (('payload',), {
+        'password=': 0.7, 'username=': 0.7, 'passwd=': 0.7, 'user=': 0.4, 'login': 0.3
+    })
+}
+
+TIERS = ('rules', 'ambiguous', 'conflict')
+
+
+def signature_scores(attack_data):
+    """Score every signature against the event; returns {label: score} for labels that matched"""
+    fields = {
+        'path': (attack_data.get('path') or '').lower(),
+        'payload': (attack_data.get('payload') or '').lower()
+    }
+    scores = {}
+    for label, (searched, patterns) in SIGNATURES.items():
+        miss = 1.0
+        for pattern, weight in patterns.items():
+            if any(pattern in fields[field] for field in searched):
+                miss *= 1.0 - weight
+        if miss < 1.0:
+            scores[label] = 1.0 - miss
+    return scores
+
+
+class CascadeClassifier:
+    """Routes events to the rule tier or the ML tier and keeps per-tier counters"""
+
+    def __init__(self, threshold=0.9, conflict_threshold=0.5):
+        self.threshold = threshold
+        self.conflict_threshold = conflict_threshold
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = {tier: 0 for tier in TIERS}
+            self.seconds = {tier: 0.0 for tier in TIERS}
+            self.rule_labels = {}
+
+    def route(self, attack_data):
+        """Return (tier, label, score): tier 'rules' is final, anything else needs ML"""
+        scores = signature_scores(attack_data)
+        if not scores:
+            return 'ambiguous', None, 0.0
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        label, score = ranked[0]
+        if len(ranked) > 1 and ranked[1][1] >= self.conflict_threshold:
+            return 'conflict', label, score
+        if score < self.threshold:
+            return 'ambiguous', label, score
+        return 'rules', label, score
+
+    def record(self, tier, seconds, label=None):
+        with self._lock:
+            self.hits[tier] += 1
+            self.seconds[tier] += seconds
+            if tier == 'rules':
+                self.rule_labels[label] = self.rule_labels.get(label, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            total = sum(self.hits.values())
+            return {
+                'signature_version': SIGNATURE_VERSION,
+                'threshold': self.threshold,
+                'conflict_threshold': self.conflict_threshold,
+                'events': total,
+                'tiers': {
+                    tier: {
+                        'hits': self.hits[tier],
+                        'hit_rate': round(self.hits[tier] / total, 4) if total else 0.0,
+                        'avg_latency_ms': round(self.seconds[tier] / self.hits[tier] * 1000, 4) if self.hits[tier] else None
+                    }
+                    for tier in TIERS
+                },
+                'rule_labels': dict(self.rule_labels)
+            }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def compare(rows, model, classifier):
+    """Classify rows ML-only and through the cascade, timing each event like the live path"""
+    import server_enhanced
+
+    def ml_only(attack):
+        X = server_enhanced.extract_features_batch([attack])
+        labels, _ = server_enhanced.predict_batch(model, X)
+        return str(labels[0])
+
+    ml_correct = cascade_correct = rule_correct = 0
+    ml_times, cascade_times = [], []
+    for attack, truth in rows:
+        started = time.perf_counter()
+        ml_label = ml_only(attack)
+        ml_times.append(time.perf_counter() - started)
+        ml_correct += ml_label == truth
+
+        started = time.perf_counter()
+        tier, label, _ = classifier.route(attack)
+        if tier != 'rules':
+            label = ml_only(attack)
+        elapsed = time.perf_counter() - started
+        cascade_times.append(elapsed)
+        classifier.record(tier, elapsed, label)
+        cascade_correct += label == truth
+        if tier == 'rules':
+            rule_correct += label == truth
+
+    n = len(rows)
+    rule_hits = classifier.hits['rules']
+    return {
+        'events': n,
+        'ml_only': {
+            'accuracy': ml_correct / n,
+            'mean_ms': sum(ml_times) / n * 1000,
+            'p99_ms': percentile(ml_times, 0.99) * 1000
+        },
+        'cascade': {
+            'accuracy': cascade_correct / n,
+            'mean_ms': sum(cascade_times) / n * 1000,
+            'p99_ms': percentile(cascade_times, 0.99) * 1000
+        },
+        'rule_precision': rule_correct / rule_hits if rule_hits else None,
+        'tiers': classifier.stats()['tiers']
+    }
+
+
+def load_labelled_rows(db_path, limit):
+    """Newest stored attacks with a ground truth: the analyst-confirmed label, else the device label"""
+    import interning
+
+    conn = interning.connect(db_path)
+    cursor = conn.execute('''
+        SELECT source_ip, path, payload, timestamp, COALESCE(confirmed_label, attack_type)
+        FROM attacks_view
+        WHERE COALESCE(confirmed_label, attack_type) IS NOT NULL
+        ORDER BY id DESC LIMIT ?
+    ''', (limit,))
+    rows = [
+        ({'source_ip': ip or '0.0.0.0', 'path': path or '', 'payload': payload or '', 'timestamp': ts or 0}, truth)
+        for ip, path, payload, ts, truth in cursor.fetchall()
+    ]
+    conn.close()
+    return rows
+
+
+def main():
+    import joblib
+    import server_enhanced
+
+    parser = argparse.ArgumentParser(description='Compare cascade and ML-only classification on stored attacks')
+    parser.add_argument('--db', default=server_enhanced.DATABASE_PATH, help='SQLite database path')
+    parser.add_argument('--model', default=server_enhanced.MODEL_PATH, help='Model file for the ML tier')
+    parser.add_argument('--limit', type=int, default=20000, help='Newest N attacks to evaluate')
+    parser.add_argument('--threshold', type=float, default=0.9, help='Signature score needed to skip ML')
+    parser.add_argument('--conflict-threshold', type=float, default=0.5,
+                        help='Score at which a second matching signature counts as a conflict')
+    args = parser.parse_args()
+
+    rows = load_labelled_rows(args.db, args.limit)
+    if not rows:
+        print("❌ No labelled attacks found")
+        return
+    model = joblib.load(args.model)
+    report = compare(rows, model, CascadeClassifier(args.threshold, args.conflict_threshold))
+
+    print(f"🔬 Cascade vs ML-only on {report['events']} stored attacks (threshold {args.threshold})")
+    for name in ('ml_only', 'cascade'):
+        result = report[name]
+        print(f"   {name:<8} accuracy {result['accuracy']:.3%}  mean {result['mean_ms']:.3f}ms  p99 {result['p99_ms']:.3f}ms")
+    for tier, result in report['tiers'].items():
+        print(f"   tier {tier:<10} {result['hits']:>7} events ({result['hit_rate']:.1%})")
+    if report['rule_precision'] is not None:
+        print(f"🎯 Rule tier precision: {report['rule_precision']:.3%}")
+    speedup = report['ml_only']['mean_ms'] / report['cascade']['mean_ms'] if report['cascade']['mean_ms'] else 0
+    print(f"⚡ Mean latency speedup: {speedup:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
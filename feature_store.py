@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Append-only binary store of per-attack feature vectors
+Vectors are packed as float32 rows in `<prefix>.f32`, with the matching
+attack ids as int64 in `<prefix>.ids`. Both files are plain arrays, so the
+whole store can be memory-mapped as NumPy matrices for training and drift
+evaluation without re-parsing payloads or copying data. The writer side is
+pure stdlib so the server does not pay for importing NumPy at startup.
+"""
+
+import os
+import threading
+from array import array
+
+N_FEATURES = 50
+
+
+class FeatureStore:
+    """Writer side of the feature store; safe to share between request threads"""
+
+    def __init__(self, prefix, n_features=N_FEATURES):
+        self.prefix = prefix
+        self.n_features = n_features
+        self.row_bytes = 4 * n_features
+        self._lock = threading.Lock()
+        self._repair()
+        self._features = open(f"{prefix}.f32", 'ab')
+        self._ids = open(f"{prefix}.ids", 'ab')
+
+    def _repair(self):
+        """Trim a half-written trailing row left behind by a crash"""
+        features_path, ids_path = f"{self.prefix}.f32", f"{self.prefix}.ids"
+        for path in (features_path, ids_path):
+            if not os.path.exists(path):
+                open(path, 'wb').close()
+        rows = min(os.path.getsize(features_path) // self.row_bytes, os.path.getsize(ids_path) // 8)
+        os.truncate(features_path, rows * self.row_bytes)
+        os.truncate(ids_path, rows * 8)
+
+    def append(self, attack_id, features):
+        self.append_many([attack_id], [features])
+
+    def append_many(self, attack_ids, feature_rows):
+        matrix = array('f')
+        for row in feature_rows:
+            if len(row) != self.n_features:
+                raise ValueError(f"Expected {self.n_features} features, got {len(row)}")
+            matrix.extend(float(value) for value in row)
+        ids = array('q', (int(attack_id) for attack_id in attack_ids))
+        with self._lock:
+            self._features.write(matrix.tobytes())
+            self._ids.write(ids.tobytes())
+            self._features.flush()
+            self._ids.flush()
+
+    def close(self):
+        with self._lock:
+            self._features.close()
+            self._ids.close()
+
+
+def load_feature_matrix(prefix, n_features=N_FEATURES):
+    """Memory-map the store read-only; returns (ids, X) with X shaped (rows, n_features)"""
+    import numpy as np
+
+    features_path, ids_path = f"{prefix}.f32", f"{prefix}.ids"
+    rows = min(os.path.getsize(features_path) // (4 * n_features), os.path.getsize(ids_path) // 8)
+    if rows == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, n_features), dtype=np.float32)
+
+    ids = np.memmap(ids_path, dtype=np.int64, mode='r', shape=(rows,))
+    X = np.memmap(features_path, dtype=np.float32, mode='r', shape=(rows, n_features))
+    return ids, X
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Time-bucketed ring buffers of attack counts
+Minute, hour and day rings, overall and per attack type, so frequency
+charts can be answered from memory instead of aggregate SQL queries, plus
+running per-type totals for the dashboard's breakdowns.
+"""
+
+import threading
+import time
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+
+# (bucket width in seconds, number of buckets kept)
+DEFAULT_RESOLUTIONS = {
+    'minute': (MINUTE, 24 * 60),
+    'hour': (HOUR, 24 * 7),
+    'day': (DAY, 30)
+}
+
+
+class RingCounter:
+    """Fixed number of consecutive time buckets; old buckets are recycled in place"""
+
+    def __init__(self, bucket_seconds, size):
+        self.bucket_seconds = bucket_seconds
+        self.size = size
+        self.counts = [0] * size
+        self.epochs = [-1] * size  # Absolute bucket number currently held in each slot
+
+    def add(self, timestamp, count=1):
+        bucket = int(timestamp // self.bucket_seconds)
+        slot = bucket % self.size
+        if self.epochs[slot] != bucket:
+            if bucket < self.epochs[slot]:
+                return  # Older than anything the ring still covers
+            self.epochs[slot] = bucket
+            self.counts[slot] = 0
+        self.counts[slot] += count
+
+    def series(self, n, now):
+        """Counts for the last n buckets ending with the one containing now, oldest first"""
+        current = int(now // self.bucket_seconds)
+        result = []
+        for bucket in range(current - min(n, self.size) + 1, current + 1):
+            slot = bucket % self.size
+            count = self.counts[slot] if self.epochs[slot] == bucket else 0
+            result.append((bucket * self.bucket_seconds, count))
+        return result
+
+
+class AttackFrequency:
+    """Ring buffers for all attacks plus one set per attack type"""
+
+    def __init__(self, resolutions=None):
+        self.resolutions = resolutions or DEFAULT_RESOLUTIONS
+        self.overall = self._new_rings()
+        self.by_type = {}
+        self._lock = threading.Lock()
+
+    def _new_rings(self):
+        return {name: RingCounter(seconds, size) for name, (seconds, size) in self.resolutions.items()}
+
+    def add(self, attack_type, timestamp=None, count=1):
+        timestamp = time.time() if timestamp is None else timestamp
+        attack_type = attack_type or 'unknown'
+        with self._lock:
+            rings = self.by_type.get(attack_type)
+            if rings is None:
+                rings = self.by_type[attack_type] = self._new_rings()
+            for name in self.resolutions:
+                self.overall[name].add(timestamp, count)
+                rings[name].add(timestamp, count)
+
+    def series(self, resolution, n, attack_type=None, now=None):
+        """[(bucket_start_epoch, count), ...] for the last n buckets, oldest first"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if attack_type is None:
+                rings = self.overall
+            else:
+                rings = self.by_type.get(attack_type)
+                if rings is None:
+                    seconds = self.resolutions[resolution][0]
+                    current = int(now // seconds)
+                    return [(bucket * seconds, 0) for bucket in range(current - n + 1, current + 1)]
+            return rings[resolution].series(n, now)
+
+    def attack_types(self):
+        with self._lock:
+            return list(self.by_type)
+
+
+class AttackTotals:
+    """Running per-type row counts and confidence sums for the hot attacks table"""
+
+    def __init__(self):
+        self.counts = {}
+        self.confidence_sums = {}
+        self.confidence_counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, attack_type, confidence=None, count=1):
+        attack_type = attack_type or 'unknown'
+        with self._lock:
+            self.counts[attack_type] = self.counts.get(attack_type, 0) + count
+            if confidence is not None:
+                self.confidence_sums[attack_type] = self.confidence_sums.get(attack_type, 0.0) + float(confidence)
+                self.confidence_counts[attack_type] = self.confidence_counts.get(attack_type, 0) + 1
+
+    def load(self, rows):
+        """Replace the totals with [(attack_type, count, confidence_sum, confidence_count), ...]"""
+        counts, sums, confidence_counts = {}, {}, {}
+        for attack_type, count, confidence_sum, confidence_count in rows:
+            attack_type = attack_type or 'unknown'
+            counts[attack_type] = counts.get(attack_type, 0) + count
+            if confidence_count:
+                sums[attack_type] = sums.get(attack_type, 0.0) + confidence_sum
+                confidence_counts[attack_type] = confidence_counts.get(attack_type, 0) + confidence_count
+        with self._lock:
+            self.counts, self.confidence_sums, self.confidence_counts = counts, sums, confidence_counts
+
+    def total(self):
+        with self._lock:
+            return sum(self.counts.values())
+
+    def by_type(self):
+        """[(attack_type, count, avg_confidence), ...], most frequent first"""
+        with self._lock:
+            rows = [
+                (attack_type, count,
+                 self.confidence_sums[attack_type] / self.confidence_counts[attack_type]
+                 if self.confidence_counts.get(attack_type) else None)
+                for attack_type, count in self.counts.items()
+            ]
+        return sorted(rows, key=lambda row: row[1], reverse=True)
@@ -14,6 +14,9 @@ const char* password = "YOUR_WIFI_PASSWORD";
 // Server Configuration - CHANGE THIS TO YOUR COMPUTER'S IP
 const char* serverURL = "http://YOUR_SERVER_IP:5001/attack";
 
+// Upload encoding - 1 sends MessagePack (smaller, cheaper to parse), 0 sends JSON
+#define USE_MSGPACK 0
+
 // Device Configuration
 const String device_id = "ESP32_HONEYPOT_001";
 const String device_model = "SecureCam Pro 2000";
@@ -260,9 +263,8 @@ void sendToServer(String attackType, String sourceIP, String path, String payloa
   if (WiFi.status() == WL_CONNECTED) {
     HTTPClient http;
     http.begin(serverURL);
-    http.addHeader("Content-Type", "application/json");
     
-    // Create JSON payload
+    // Create event payload
     DynamicJsonDocument doc(1024);
     doc["device_id"] = device_id;
     doc["timestamp"] = millis();
@@ -273,10 +275,18 @@ void sendToServer(String attackType, String sourceIP, String path, String payloa
     doc["device_model"] = device_model;
     doc["firmware_version"] = firmware_version;
     
+#if USE_MSGPACK
+    http.addHeader("Content-Type", "application/msgpack");
+    uint8_t buffer[1024];
+    size_t length = serializeMsgPack(doc, buffer, sizeof(buffer));
+    int httpResponseCode = http.POST(buffer, length);
+#else
+    http.addHeader("Content-Type", "application/json");
     String jsonString;
     serializeJson(doc, jsonString);
     
     int httpResponseCode = http.POST(jsonString);
+#endif
     
     if (httpResponseCode > 0) {
       Serial.println("Data sent to server successfully");
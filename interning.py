@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Content-addressed interning of attack paths and payloads
+Each distinct path and payload is stored once in a hash-keyed table and
+referenced by id from attack rows; payloads above a size threshold are
+zlib-compressed. The `attacks_view` view resolves the references so reads
+see the same path/payload columns as the original inline schema.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+
+VIEW_NAME = 'attacks_view'
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def inflate(blob):
+    """SQLite function: decompress an interned payload"""
+    return zlib.decompress(blob).decode('utf-8', 'surrogatepass') if blob is not None else None
+
+
+def connect(db_path, **kwargs):
+    """Open a connection that can read attacks_view"""
+    conn = sqlite3.connect(db_path, **kwargs)
+    conn.create_function('inflate', 1, inflate, deterministic=True)
+    return conn
+
+
+def init_intern_tables(cursor):
+    """Create the interned tables, reference columns and the resolving view"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS paths (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hash TEXT UNIQUE NOT NULL,
+            path TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS payloads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hash TEXT UNIQUE NOT NULL,
+            payload TEXT,
+            compressed BLOB,
+            size INTEGER NOT NULL
+        )
+    ''')
+
+    existing = {row[1] for row in cursor.execute('PRAGMA table_info(attacks)')}
+    for column in ('path_id', 'payload_id'):
+        if column not in existing:
+            cursor.execute(f'ALTER TABLE attacks ADD COLUMN {column} INTEGER')
+    create_attacks_view(cursor)
+
+
+def create_attacks_view(cursor):
+    """(Re)build attacks_view over the current attacks columns"""
+    selected = []
+    for row in cursor.execute('PRAGMA table_info(attacks)').fetchall():
+        column = row[1]
+        if column in ('path_id', 'payload_id'):
+            continue
+        if column == 'path':
+            selected.append('COALESCE(a.path, p.path) AS path')
+        elif column == 'payload':
+            selected.append('COALESCE(a.payload, pl.payload, inflate(pl.compressed)) AS payload')
+        else:
+            selected.append(f'a.{column} AS {column}')
+
+    cursor.execute(f'DROP VIEW IF EXISTS {VIEW_NAME}')
+    cursor.execute(f'''
+        CREATE VIEW {VIEW_NAME} AS
+        SELECT {', '.join(selected)}
+        FROM attacks a
+        LEFT JOIN paths p ON p.id = a.path_id
+        LEFT JOIN payloads pl ON pl.id = a.payload_id
+    ''')
+
+
+class Interner:
+    """Resolve path/payload text to interned ids, with an LRU cache of hash -> id"""
+
+    def __init__(self, compress_threshold=256, cache_size=8192):
+        self.compress_threshold = compress_threshold
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is not None:
+                self._cache.move_to_end(key)
+            return value
+
+    def remember(self, pending):
+        """Cache ids only once the transaction that created them has committed"""
+        with self._lock:
+            for key, value in pending:
+                self._cache[key] = value
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def intern_path(self, cursor, path, pending):
+        if path is None:
+            return None
+        digest = content_hash(path)
+        key = ('path', digest)
+        path_id = self._cached(key)
+        if path_id is None:
+            cursor.execute('INSERT OR IGNORE INTO paths (hash, path) VALUES (?, ?)', (digest, path))
+            path_id = cursor.execute('SELECT id FROM paths WHERE hash = ?', (digest,)).fetchone()[0]
+            pending.append((key, path_id))
+        return path_id
+
+    def intern_payload(self, cursor, payload, pending):
+        if payload is None:
+            return None
+        digest = content_hash(payload)
+        key = ('payload', digest)
+        payload_id = self._cached(key)
+        if payload_id is None:
+            encoded = payload.encode('utf-8', 'surrogatepass')
+            if len(encoded) > self.compress_threshold:
+                text, blob = None, zlib.compress(encoded, 6)
+            else:
+                text, blob = payload, None
+            cursor.execute('''
+                INSERT OR IGNORE INTO payloads (hash, payload, compressed, size) VALUES (?, ?, ?, ?)
+            ''', (digest, text, blob, len(encoded)))
+            payload_id = cursor.execute('SELECT id FROM payloads WHERE hash = ?', (digest,)).fetchone()[0]
+            pending.append((key, payload_id))
+        return payload_id
+
+
+def intern_block_data(attack_data):
+    """Block payload that commits to path/payload by content hash instead of a full copy"""
+    block_data = {k: v for k, v in attack_data.items() if k not in ('path', 'payload')}
+    if attack_data.get('path') is not None:
+        block_data['path_hash'] = content_hash(attack_data['path'])
+    if attack_data.get('payload') is not None:
+        block_data['payload_hash'] = content_hash(attack_data['payload'])
+    return block_data
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Source IP enrichment backed by binary prefix tries
+Classifies addresses by scope (private, loopback, link-local, ...) using the
+IANA special-purpose ranges, and looks them up in optional local data files:
+ASN mappings and threat lists, which are reloaded when they change on disk.
+Lookups walk at most one trie level per prefix bit and results are cached
+per IP, so a flood of events from the same sources costs a dict hit each.
+
+Data directory layout (all files optional):
+    private.txt       extra CIDRs treated as private (one per line)
+    asn.csv           cidr,asn,organization
+    threats/<name>.txt  CIDRs or single IPs on the <name> threat list
+"""
+
+import csv
+import glob
+import ipaddress
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+# (cidr, scope); anything unmatched is 'public'
+SPECIAL_RANGES = [
+    ('0.0.0.0/8', 'reserved'),
+    ('10.0.0.0/8', 'private'),
+    ('100.64.0.0/10', 'shared'),
+    ('127.0.0.0/8', 'loopback'),
+    ('169.254.0.0/16', 'link_local'),
+    ('172.16.0.0/12', 'private'),
+    ('192.0.0.0/24', 'reserved'),
+    ('192.0.2.0/24', 'reserved'),
+    ('192.168.0.0/16', 'private'),
+    ('198.18.0.0/15', 'reserved'),
+    ('198.51.100.0/24', 'reserved'),
+    ('203.0.113.0/24', 'reserved'),
+    ('224.0.0.0/4', 'multicast'),
+    ('240.0.0.0/4', 'reserved'),
+    ('::/128', 'reserved'),
+    ('::1/128', 'loopback'),
+    ('100::/64', 'reserved'),
+    ('2001:db8::/32', 'reserved'),
+    ('fc00::/7', 'private'),
+    ('fe80::/10', 'link_local'),
+    ('ff00::/8', 'multicast')
+]
+
+ENRICHMENT_FEATURE_NAMES = ['ip_is_public', 'ip_has_asn', 'ip_threat_lists', 'ip_is_v6']
+
+V4_MAPPED_PREFIX = b'\x00' * 10 + b'\xff\xff'
+
+INVALID = {'ip_version': 0, 'ip_scope': 'invalid', 'asn': None, 'as_org': None, 'threat_lists': []}
+
+
+class PrefixTrie:
+    """Binary trie keyed by address bits; nodes are [zero_child, one_child, value]"""
+
+    def __init__(self, bits):
+        self.bits = bits
+        self.root = [None, None, None]
+        self.prefixes = 0
+
+    def _node(self, network, prefix_len):
+        node = self.root
+        for shift in range(self.bits - 1, self.bits - 1 - prefix_len, -1):
+            bit = (network >> shift) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        if node[2] is None:
+            self.prefixes += 1
+        return node
+
+    def insert(self, network, prefix_len, value):
+        self._node(network, prefix_len)[2] = value
+
+    def add(self, network, prefix_len, item):
+        """Add item to the tuple of values held at a prefix"""
+        node = self._node(network, prefix_len)
+        if item not in (node[2] or ()):
+            node[2] = (node[2] or ()) + (item,)
+
+    def longest_match(self, address):
+        node, found = self.root, self.root[2]
+        for shift in range(self.bits - 1, -1, -1):
+            node = node[(address >> shift) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                found = node[2]
+        return found
+
+    def all_matches(self, address):
+        """Values of every prefix containing the address, shortest first"""
+        node = self.root
+        found = [node[2]] if node[2] is not None else []
+        for shift in range(self.bits - 1, -1, -1):
+            node = node[(address >> shift) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                found.append(node[2])
+        return found
+
+
+class IPEnricher:
+    """Scope/ASN/threat-list lookups with a per-IP LRU cache and hot-reloaded data files"""
+
+    def __init__(self, data_dir=None, cache_size=65536):
+        self.data_dir = data_dir
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._signature = None
+        self.loaded_at = None
+        self.counts = {}
+        self._tables = self._build()
+
+    def _files(self):
+        if not self.data_dir or not os.path.isdir(self.data_dir):
+            return []
+        paths = [os.path.join(self.data_dir, name) for name in ('private.txt', 'asn.csv')]
+        paths += sorted(glob.glob(os.path.join(self.data_dir, 'threats', '*.txt')))
+        return [path for path in paths if os.path.isfile(path)]
+
+    def _file_signature(self):
+        return tuple((path, os.path.getmtime(path), os.path.getsize(path)) for path in self._files())
+
+    @staticmethod
+    def _read_cidrs(path):
+        with open(path) as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    try:
+                        yield ipaddress.ip_network(line, strict=False)
+                    except ValueError:
+                        continue
+
+    def _build(self):
+        """Parse the built-in ranges and the data files into fresh tries"""
+        scope = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        asn = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        threats = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+
+        for cidr, name in SPECIAL_RANGES:
+            network = ipaddress.ip_network(cidr)
+            scope[network.version].insert(int(network.network_address), network.prefixlen, name)
+
+        files = self._files()
+        for path in files:
+            name = os.path.relpath(path, self.data_dir)
+            if name == 'private.txt':
+                for network in self._read_cidrs(path):
+                    scope[network.version].insert(int(network.network_address), network.prefixlen, 'private')
+            elif name == 'asn.csv':
+                with open(path, newline='') as f:
+                    for row in csv.reader(f):
+                        if len(row) < 2 or row[0].startswith('#'):
+                            continue
+                        try:
+                            network = ipaddress.ip_network(row[0].strip(), strict=False)
+                            number = int(row[1].strip().upper().lstrip('AS'))
+                        except ValueError:
+                            continue  # Header or malformed row
+                        organization = row[2].strip() if len(row) > 2 else None
+                        asn[network.version].insert(int(network.network_address), network.prefixlen,
+                                                    (number, organization))
+            else:
+                list_name = os.path.splitext(os.path.basename(path))[0]
+                for network in self._read_cidrs(path):
+                    threats[network.version].add(int(network.network_address), network.prefixlen, list_name)
+
+        self.counts = {
+            'asn_prefixes': asn[4].prefixes + asn[6].prefixes,
+            'threat_prefixes': threats[4].prefixes + threats[6].prefixes,
+            'files': len(files)
+        }
+        self._signature = self._file_signature()
+        self.loaded_at = time.time()
+        return scope, asn, threats
+
+    def reload_if_changed(self):
+        """Rebuild the tries if any data file changed; returns True when reloaded"""
+        if self._file_signature() == self._signature:
+            return False
+        tables = self._build()
+        with self._lock:
+            self._tables = tables
+            self._cache = OrderedDict()
+        return True
+
+    def start_watcher(self, interval, log):
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.reload_if_changed():
+                        log.info(f"IP enrichment data reloaded: {self.counts}")
+                except Exception as e:
+                    log.error(f"IP enrichment reload failed: {e}")
+
+        threading.Thread(target=run, name='ip-enrichment-reload', daemon=True).start()
+
+    def lookup(self, ip):
+        """Enrichment dict for an address string; treat the result as read-only (it is cached)"""
+        with self._lock:
+            cached = self._cache.get(ip)
+            if cached is not None:
+                self._cache.move_to_end(ip)
+                return cached
+            tables = self._tables
+
+        result = self._resolve(ip, tables)
+        with self._lock:
+            if self._tables is not tables:
+                return result  # Data reloaded meanwhile; don't cache a stale answer
+            self._cache[ip] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _resolve(ip, tables):
+        scope, asn, threats = tables
+        # inet_pton is several times faster than ipaddress.ip_address on the per-event path
+        text = str(ip).strip()
+        try:
+            packed, version = socket.inet_pton(socket.AF_INET, text), 4
+        except OSError:
+            try:
+                packed, version = socket.inet_pton(socket.AF_INET6, text.split('%', 1)[0]), 6
+            except OSError:
+                return INVALID
+            if packed[:12] == V4_MAPPED_PREFIX:
+                packed, version = packed[12:], 4
+        value = int.from_bytes(packed, 'big')
+
+        as_info = asn[version].longest_match(value)
+        matches = threats[version].all_matches(value)
+        lists = sorted({name for names in matches for name in names}) if matches else []
+        return {
+            'ip_version': version,
+            'ip_scope': scope[version].longest_match(value) or 'public',
+            'asn': as_info[0] if as_info else None,
+            'as_org': as_info[1] if as_info else None,
+            'threat_lists': lists
+        }
+
+    def cache_info(self):
+        with self._lock:
+            return {'cached_ips': len(self._cache), 'cache_size': self.cache_size}
+
+
+def enrichment_features(enrichment):
+    """Optional model features, in ENRICHMENT_FEATURE_NAMES order"""
+    return [
+        1 if enrichment['ip_scope'] == 'public' else 0,
+        1 if enrichment['asn'] is not None else 0,
+        len(enrichment['threat_lists']),
+        1 if enrichment['ip_version'] == 6 else 0
+    ]
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Non-blocking structured logging for the honeypot server
+Records are queued on the request thread and written by a background
+listener as JSON lines to a size-rotated file. Per-event INFO/DEBUG records
+are sampled and rate-limited; warnings and errors always pass through.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+# Attributes every LogRecord has; anything else came from `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 6),
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class EventSamplingFilter(logging.Filter):
+    """Sample and rate-limit hot-path records tagged with an `event` extra
+
+    Every `sample_rate`-th record per event is kept, and at most `rate_limit`
+    kept records per event per second are let through. Records at WARNING or
+    above, and records without an `event` tag, are never dropped. The number
+    of suppressed records is attached to the next record that passes.
+    """
+
+    def __init__(self, sample_rate=1, rate_limit=10):
+        super().__init__()
+        self.sample_rate = max(1, int(sample_rate))
+        self.rate_limit = rate_limit
+        self._lock = threading.Lock()
+        self._seen = {}
+        self._windows = {}
+        self._suppressed = {}
+
+    def filter(self, record):
+        event = getattr(record, 'event', None)
+        if event is None or record.levelno >= logging.WARNING:
+            return True
+
+        with self._lock:
+            seen = self._seen.get(event, 0) + 1
+            self._seen[event] = seen
+
+            keep = seen % self.sample_rate == 0
+            if keep and self.rate_limit:
+                second = int(time.time())
+                window_second, window_count = self._windows.get(event, (second, 0))
+                if window_second != second:
+                    window_second, window_count = second, 0
+                keep = window_count < self.rate_limit
+                self._windows[event] = (window_second, window_count + (1 if keep else 0))
+
+            if not keep:
+                self._suppressed[event] = self._suppressed.get(event, 0) + 1
+                return False
+
+            suppressed = self._suppressed.pop(event, 0)
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+def configure_queue_logging(log_file='honeypot.log', max_bytes=10 * 1024 * 1024, backup_count=5,
+                            sample_rate=1, rate_limit=10, level=logging.INFO, console=True):
+    """Route all root-logger records through a queue to a background writer
+
+    Returns the started QueueListener; it is also stopped automatically at exit
+    so buffered records are flushed.
+    """
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+    )
+    file_handler.setFormatter(JsonFormatter())
+    handlers = [file_handler]
+
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        handlers.append(console_handler)
+
+    # Unbounded so that enqueueing never blocks or drops; volume is bounded by sampling instead
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(EventSamplingFilter(sample_rate, rate_limit))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Online incremental learning beside the batch-trained production model
+Confirmed-label feature vectors are queued from request threads and consumed
+by a background thread that updates an SGD classifier with partial_fit. A
+slice of the stream is held out; periodically the learner is checkpointed
+and scored against the production model on that holdout, and the snapshot is
+handed to a promotion callback when it wins.
+"""
+
+import copy
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+import joblib
+
+
+class OnlineLearner:
+    """Incrementally trained classifier over a fixed label set"""
+
+    def __init__(self, classes, checkpoint_path='online_model.pkl', holdout_fraction=0.2,
+                 holdout_size=2000, batch_size=64, eval_interval=300, min_holdout=200, margin=0.01):
+        from sklearn.linear_model import SGDClassifier
+        from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+        self.label_encoder = LabelEncoder().fit(sorted(classes))
+        self.class_ids = list(range(len(self.label_encoder.classes_)))
+        self.scaler = StandardScaler()
+        self.model = SGDClassifier(loss='log_loss', alpha=1e-4, random_state=42)
+
+        self.checkpoint_path = checkpoint_path
+        self.holdout_fraction = holdout_fraction
+        self.holdout = deque(maxlen=holdout_size)
+        self.batch_size = batch_size
+        self.eval_interval = eval_interval
+        self.min_holdout = min_holdout
+        self.margin = margin
+
+        self.samples_trained = 0
+        self.samples_skipped = 0
+        self.checkpoints = 0
+        self.last_evaluation = None
+        self._queue = queue.SimpleQueue()
+        self._random = random.Random(42)
+        self._lock = threading.Lock()
+
+    @property
+    def known_labels(self):
+        return set(self.label_encoder.classes_)
+
+    def submit(self, features, label):
+        """Queue one confirmed example; cheap enough for the request thread"""
+        if label not in self.known_labels:
+            self.samples_skipped += 1
+            return False
+        self._queue.put((features, label))
+        return True
+
+    def _drain(self, timeout):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _train(self, batch):
+        import numpy as np
+
+        train = []
+        for features, label in batch:
+            if self._random.random() < self.holdout_fraction:
+                self.holdout.append((features, label))
+            else:
+                train.append((features, label))
+        if not train:
+            return
+
+        X = np.array([features for features, _ in train], dtype=float)
+        y = self.label_encoder.transform([label for _, label in train])
+        with self._lock:
+            self.scaler.partial_fit(X)
+            self.model.partial_fit(self.scaler.transform(X), y, classes=self.class_ids)
+            self.samples_trained += len(train)
+
+    def snapshot(self):
+        """Immutable model_data-style copy that can be served while training continues"""
+        with self._lock:
+            if not self.samples_trained:
+                return None
+            self.checkpoints += 1
+            return {
+                'model': copy.deepcopy(self.model),
+                'scaler': copy.deepcopy(self.scaler),
+                'label_encoder': self.label_encoder,
+                'model_name': 'OnlineSGD',
+                'checkpoint': self.checkpoints,
+                'samples_trained': self.samples_trained,
+                'accuracy': None,
+                'feature_names': [f'feature_{i}' for i in range(self.scaler.n_features_in_)]
+            }
+
+    def checkpoint(self, snapshot):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        joblib.dump(snapshot, tmp_path)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def restore(self):
+        """Resume from the last checkpoint on disk, if its label set matches"""
+        if not os.path.exists(self.checkpoint_path):
+            return False
+        snapshot = joblib.load(self.checkpoint_path)
+        if list(snapshot['label_encoder'].classes_) != list(self.label_encoder.classes_):
+            return False
+        with self._lock:
+            self.model = snapshot['model']
+            self.scaler = snapshot['scaler']
+            self.samples_trained = snapshot['samples_trained']
+            self.checkpoints = snapshot['checkpoint']
+        return True
+
+    def evaluate(self, snapshot, baseline, predict_batch):
+        """Holdout accuracy of the snapshot and of the baseline model"""
+        import numpy as np
+
+        holdout = list(self.holdout)
+        if not holdout:
+            return None
+        X = np.array([features for features, _ in holdout], dtype=float)
+        y = np.array([label for _, label in holdout])
+
+        online_labels, _ = predict_batch(snapshot, X)
+        result = {
+            'holdout_size': len(holdout),
+            'online_accuracy': float(np.mean(online_labels == y)),
+            'baseline_accuracy': None,
+            'evaluated_at': time.time()
+        }
+        if baseline is not None:
+            baseline_labels, _ = predict_batch(baseline, X)
+            result['baseline_accuracy'] = float(np.mean(baseline_labels == y))
+        return result
+
+    def should_promote(self, result):
+        if result is None or result['holdout_size'] < self.min_holdout:
+            return False
+        if result['baseline_accuracy'] is None:
+            return True
+        return result['online_accuracy'] > result['baseline_accuracy'] + self.margin
+
+    def run(self, get_baseline, predict_batch, promote, log):
+        """Background loop: train on queued examples, checkpoint/evaluate/promote periodically"""
+        next_evaluation = time.time() + self.eval_interval
+        while True:
+            batch = self._drain(timeout=1.0)
+            if batch:
+                try:
+                    self._train(batch)
+                except Exception as e:
+                    log.error(f"Online learner update failed: {e}")
+
+            if time.time() < next_evaluation:
+                continue
+            next_evaluation = time.time() + self.eval_interval
+
+            try:
+                snapshot = self.snapshot()
+                if snapshot is None:
+                    continue
+                self.checkpoint(snapshot)
+                result = self.evaluate(snapshot, get_baseline(), predict_batch)
+                self.last_evaluation = result
+                if result:
+                    snapshot['accuracy'] = result['online_accuracy']
+                    log.info(f"Online model checkpoint #{snapshot['checkpoint']}: "
+                             f"{result['online_accuracy']:.3f} vs baseline {result['baseline_accuracy']} "
+                             f"on {result['holdout_size']} holdout samples")
+                if self.should_promote(result):
+                    promote(snapshot)
+            except Exception as e:
+                log.error(f"Online learner evaluation failed: {e}")
+
+    def start(self, get_baseline, predict_batch, promote, log):
+        threading.Thread(
+            target=self.run, args=(get_baseline, predict_batch, promote, log),
+            name='online-learner', daemon=True
+        ).start()
+
+    def status(self):
+        return {
+            'samples_trained': self.samples_trained,
+            'samples_skipped': self.samples_skipped,
+            'holdout_size': len(self.holdout),
+            'queued': self._queue.qsize(),
+            'checkpoints': self.checkpoints,
+            'classes': list(self.label_encoder.classes_),
+            'last_evaluation': self.last_evaluation
+        }
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Time-partitioned attack storage with columnar archives
+Recent attacks stay in the SQLite `attacks` table (the hot tier). Days older
+than the retention age are compacted into one compressed columnar archive per
+day and removed from SQLite, so the hot table, its queries and VACUUM only
+touch recent history. Time-range reads are routed to the hot table and to
+whichever daily archives overlap the range.
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+import zipfile
+from datetime import datetime, timedelta
+
+import interning
+import search
+
+ARCHIVE_FORMAT_VERSION = 1
+ARCHIVE_PREFIX = 'attacks_'
+ARCHIVE_SUFFIX = '.zip'
+
+
+def archive_path(archive_dir, day):
+    return os.path.join(archive_dir, f"{ARCHIVE_PREFIX}{day}{ARCHIVE_SUFFIX}")
+
+
+def archived_days(archive_dir):
+    """Sorted list of YYYY-MM-DD partitions that have an archive file"""
+    pattern = os.path.join(archive_dir, f"{ARCHIVE_PREFIX}*{ARCHIVE_SUFFIX}")
+    return sorted(os.path.basename(p)[len(ARCHIVE_PREFIX):-len(ARCHIVE_SUFFIX)] for p in glob.glob(pattern))
+
+
+def read_archive_meta(path):
+    with zipfile.ZipFile(path) as archive:
+        return json.loads(archive.read('meta.json'))
+
+
+def read_archive(path, columns=None):
+    """Load an archive as {column: [values]}; only the requested columns are decompressed"""
+    with zipfile.ZipFile(path) as archive:
+        meta = json.loads(archive.read('meta.json'))
+        wanted = meta['columns'] if columns is None else [c for c in columns if c in meta['columns']]
+        return {column: json.loads(archive.read(f"{column}.json")) for column in wanted}
+
+
+def write_archive(path, columns, data):
+    """Write {column: [values]} as a deflate-compressed, one-member-per-column archive"""
+    ids = data.get('id', [])
+    created = [c for c in data.get('created_at', []) if c]
+    meta = {
+        'format_version': ARCHIVE_FORMAT_VERSION,
+        'partition': os.path.basename(path)[len(ARCHIVE_PREFIX):-len(ARCHIVE_SUFFIX)],
+        'rows': len(ids),
+        'columns': columns,
+        'min_id': min(ids) if ids else None,
+        'max_id': max(ids) if ids else None,
+        'min_created_at': min(created) if created else None,
+        'max_created_at': max(created) if created else None
+    }
+
+    tmp_path = f"{path}.tmp"
+    with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+        archive.writestr('meta.json', json.dumps(meta))
+        for column in columns:
+            archive.writestr(f"{column}.json", json.dumps(data[column], separators=(',', ':')))
+    with open(tmp_path, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return meta
+
+
+def archive_partition(conn, archive_dir, day):
+    """Move one day's rows from the attacks table into its archive file"""
+    cursor = conn.cursor()
+    next_day = (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    cursor.execute(
+        'SELECT * FROM attacks_view WHERE created_at >= ? AND created_at < ? ORDER BY id', (day, next_day)
+    )
+    columns = [desc[0] for desc in cursor.description]
+    rows = cursor.fetchall()
+    if not rows:
+        return 0
+
+    id_column = columns.index('id')
+
+    # Late-arriving rows for an already archived day are merged into the existing file. Rows
+    # already in it (archived by a run that crashed before its DELETE committed) are not added twice.
+    path = archive_path(archive_dir, day)
+    existing = read_archive(path) if os.path.exists(path) else None
+    archived_ids = set(existing['id']) if existing else set()
+    new_rows = [row for row in rows if row[id_column] not in archived_ids]
+
+    if new_rows:
+        data = {column: [row[i] for row in new_rows] for i, column in enumerate(columns)}
+        if existing:
+            for column in columns:
+                data[column] = existing.get(column, [None] * len(existing['id'])) + data[column]
+        write_archive(path, columns, data)
+
+    # Only delete once the archive is durably on disk, and only the rows it holds; rows that
+    # arrived after the SELECT stay for the next run. Archived rows leave the search index too.
+    if search.has_search_index(cursor):
+        search.unindex_attacks(cursor, [(row[id_column], row[columns.index('path')],
+                                         row[columns.index('payload')]) for row in rows])
+    cursor.executemany('DELETE FROM attacks WHERE id = ?', [(row[id_column],) for row in rows])
+    conn.commit()
+    return len(new_rows)
+
+
+def archive_cold_partitions(db_path, archive_dir, retention_days, vacuum=False):
+    """Archive every day older than retention_days; returns {day: rows_archived}"""
+    os.makedirs(archive_dir, exist_ok=True)
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime('%Y-%m-%d')
+
+    conn = interning.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT DISTINCT DATE(created_at) FROM attacks
+        WHERE created_at < ?
+        ORDER BY 1
+    ''', (cutoff,))
+    cold_days = [row[0] for row in cursor.fetchall() if row[0]]
+
+    archived = {}
+    for day in cold_days:
+        archived[day] = archive_partition(conn, archive_dir, day)
+
+    if vacuum and archived:
+        conn.execute('VACUUM')
+    conn.close()
+    return archived
+
+
+def query_attacks(db_path, archive_dir, start, end, columns=None, limit=None):
+    """Rows with start <= created_at < end, newest first, from the hot table and archives
+
+    start and end are 'YYYY-MM-DD[ HH:MM:SS]' strings in UTC, like created_at.
+    """
+    conn = interning.connect(db_path)
+    cursor = conn.cursor()
+    select = ', '.join(columns) if columns else '*'
+    cursor.execute(f'''
+        SELECT {select} FROM attacks_view
+        WHERE created_at >= ? AND created_at < ?
+        ORDER BY id DESC
+    ''' + (' LIMIT ?' if limit else ''), (start, end, limit) if limit else (start, end))
+    names = [desc[0] for desc in cursor.description]
+    results = [dict(zip(names, row)) for row in cursor.fetchall()]
+    conn.close()
+
+    # Archives are per UTC day; only open the ones that overlap the range
+    first_day, last_day = start[:10], end[:10]
+    for day in reversed(archived_days(archive_dir)):
+        if day < first_day or day > last_day:
+            continue
+        if limit and len(results) >= limit:
+            break
+        data = read_archive(archive_path(archive_dir, day), names if columns else None)
+        archive_names = list(data)
+        for values in reversed(list(zip(*data.values()))):
+            row = dict(zip(archive_names, values))
+            if start <= (row.get('created_at') or '') < end:
+                results.append(row)
+
+    if limit:
+        results = results[:limit]
+    return results
+
+
+def iter_archived_rows(archive_dir, since_day, columns):
+    """Yield row dicts (only the given columns) from archives on or after since_day"""
+    for day in archived_days(archive_dir):
+        if day < since_day:
+            continue
+        data = read_archive(archive_path(archive_dir, day), columns)
+        names = list(data)
+        for values in zip(*data.values()):
+            yield dict(zip(names, values))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive cold attack partitions')
+    parser.add_argument('--db', default='honeypot.db', help='SQLite database path')
+    parser.add_argument('--archive-dir', default='archive', help='Directory for daily archive files')
+    parser.add_argument('--retention-days', type=int, default=7, help='Days of history kept in SQLite')
+    parser.add_argument('--vacuum', action='store_true', help='VACUUM the database after archiving')
+    args = parser.parse_args()
+
+    start = time.time()
+    archived = archive_cold_partitions(args.db, args.archive_dir, args.retention_days, args.vacuum)
+    for day, rows in archived.items():
+        print(f"📦 {day}: {rows} rows archived")
+    print(f"✅ Archived {sum(archived.values())} rows from {len(archived)} partitions in {time.time() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
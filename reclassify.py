@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Offline reclassification of stored attack history
+Streams the attacks table in id-ordered chunks, classifies each chunk in a
+process pool with batch feature extraction, and writes label, confidence and
+model version back in bulk. Progress is checkpointed per model version in the
+database itself, so an interrupted run resumes where it stopped.
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+
+import interning
+import server_enhanced
+
+_worker_model = None
+
+
+def _init_worker(model_path, enrichment_dir):
+    global _worker_model
+    _worker_model = joblib.load(model_path)
+    # Spawned workers start with an empty enricher; features must match what the server computes
+    server_enhanced.load_ip_enrichment(enrichment_dir)
+
+
+def _classify_chunk(rows):
+    """Worker: classify [(id, source_ip, path, payload, timestamp), ...]"""
+    attacks = [
+        {'source_ip': ip or '0.0.0.0', 'path': path or '', 'payload': payload or '', 'timestamp': ts or 0}
+        for _, ip, path, payload, ts in rows
+    ]
+    X = server_enhanced.extract_features_batch(attacks)
+    labels, confidences = server_enhanced.predict_batch(_worker_model, X)
+    return [(str(label), float(conf), row[0]) for label, conf, row in zip(labels, confidences, rows)]
+
+
+def init_checkpoints(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reclassify_checkpoints (
+            model_version TEXT PRIMARY KEY,
+            last_id INTEGER,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+
+def load_checkpoint(conn, version):
+    row = conn.execute('SELECT last_id FROM reclassify_checkpoints WHERE model_version = ?', (version,)).fetchone()
+    return row[0] if row else 0
+
+
+def iter_chunks(conn, start_id, chunk_size):
+    """Keyset-paginate the attacks table by id"""
+    last_id = start_id
+    while True:
+        rows = conn.execute('''
+            SELECT id, source_ip, path, payload, timestamp
+            FROM attacks_view
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, chunk_size)).fetchall()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+
+def write_results(conn, version, results, last_id):
+    """Bulk-update one chunk and advance the checkpoint in the same transaction"""
+    with conn:
+        conn.executemany('''
+            UPDATE attacks SET ml_classification = ?, ml_confidence = ?, model_version = ?
+            WHERE id = ?
+        ''', [(label, confidence, version, attack_id) for label, confidence, attack_id in results])
+        conn.execute('''
+            INSERT INTO reclassify_checkpoints (model_version, last_id, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(model_version) DO UPDATE SET last_id = excluded.last_id, updated_at = CURRENT_TIMESTAMP
+        ''', (version, last_id))
+
+
+def reclassify(db_path, model_path, chunk_size=5000, workers=None, reset=False):
+    workers = workers or os.cpu_count() or 1
+    model = joblib.load(model_path)
+    mismatch = server_enhanced.model_feature_mismatch(model)
+    if mismatch:
+        raise SystemExit(f"❌ Cannot reclassify with {model_path}: {mismatch}")
+    version = f"{model['model_name']}@{server_enhanced.model_file_version(model_path)}"
+
+    server_enhanced.DATABASE_PATH = db_path
+    server_enhanced.init_database()
+    enrichment_dir = os.path.abspath(server_enhanced.ENRICHMENT_DIR)
+    print(f"🌐 IP enrichment from {enrichment_dir}: {server_enhanced.load_ip_enrichment(enrichment_dir).counts}")
+
+    conn = interning.connect(db_path)
+    init_checkpoints(conn)
+    if reset:
+        conn.execute('DELETE FROM reclassify_checkpoints WHERE model_version = ?', (version,))
+        conn.commit()
+
+    start_id = load_checkpoint(conn, version)
+    remaining = conn.execute('SELECT COUNT(*) FROM attacks WHERE id > ?', (start_id,)).fetchone()[0]
+    print(f"🧠 Reclassifying {remaining} attacks with {version} ({workers} workers, chunks of {chunk_size})")
+    if start_id:
+        print(f"↩️  Resuming after attack id {start_id}")
+
+    processed = 0
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, enrichment_dir)) as pool:
+        # Results are written in submission order so the checkpoint only ever covers finished chunks
+        pending = deque()
+        chunks = iter_chunks(conn, start_id, chunk_size)
+        for rows in chunks:
+            pending.append((rows[-1][0], pool.submit(_classify_chunk, rows)))
+            if len(pending) >= workers * 2:
+                processed += _drain_one(conn, version, pending, start, remaining, processed)
+        while pending:
+            processed += _drain_one(conn, version, pending, start, remaining, processed)
+
+    conn.close()
+    elapsed = time.time() - start
+    rate = processed / elapsed if elapsed else 0
+    print(f"✅ Reclassified {processed} attacks in {elapsed:.1f}s ({rate:.0f} rows/sec)")
+    return processed
+
+
+def _drain_one(conn, version, pending, start, remaining, processed):
+    last_id, future = pending.popleft()
+    results = future.result()
+    write_results(conn, version, results, last_id)
+    done = processed + len(results)
+    elapsed = time.time() - start
+    print(f"   • {done}/{remaining} rows (up to id {last_id}) - {done / elapsed if elapsed else 0:.0f} rows/sec")
+    return len(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reclassify stored attacks with the current model')
+    parser.add_argument('--db', default=server_enhanced.DATABASE_PATH, help='SQLite database path')
+    parser.add_argument('--model', default=server_enhanced.MODEL_PATH, help='Model file to classify with')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per chunk')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--reset', action='store_true', help='Ignore the checkpoint and start from the beginning')
+    args = parser.parse_args()
+
+    try:
+        reclassify(args.db, args.model, args.chunk_size, args.workers, args.reset)
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrupted - rerun the same command to resume from the last checkpoint")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Low-overhead statistical sampling profiler for the live honeypot server
+Periodically snapshots every thread's Python stack via sys._current_frames()
+and aggregates the samples into flamegraph-ready collapsed stacks
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_INTERVAL = 0.005  # 5ms between samples
+MAX_DURATION = 120  # Never hold a profiling request longer than this
+
+
+def _frame_label(frame):
+    """Render a frame as 'function (file:line)' without flamegraph separators"""
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+
+class SamplingProfiler:
+    """Sample thread stacks in a background thread for a fixed duration"""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, thread_filter=None):
+        self.interval = interval
+        self.thread_filter = thread_filter
+        self.stacks = Counter()
+        self.self_counts = Counter()
+        self.total_counts = Counter()
+        self.samples = 0  # One per sampled thread per tick
+        self.ticks = 0
+        self.duration = 0.0
+
+    def _take_sample(self, own_ident):
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            if self.thread_filter is not None and not self.thread_filter(ident):
+                continue
+
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if not stack:
+                continue
+
+            stack.reverse()
+            self.stacks[';'.join(stack)] += 1
+            self.self_counts[stack[-1]] += 1
+            for label in set(stack):
+                self.total_counts[label] += 1
+            self.samples += 1
+
+    def run(self, seconds):
+        """Sample for the given number of seconds and return self"""
+        seconds = max(0.0, min(float(seconds), MAX_DURATION))
+        own_ident = threading.get_ident()
+        start = time.perf_counter()
+        deadline = start + seconds
+
+        while time.perf_counter() < deadline:
+            self._take_sample(own_ident)
+            self.ticks += 1
+            time.sleep(self.interval)
+
+        self.duration = time.perf_counter() - start
+        return self
+
+    def collapsed(self):
+        """Collapsed stacks in Brendan Gregg's flamegraph.pl format"""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, n=20):
+        """Top-N functions ranked by self time"""
+        # Each tick samples every thread once, so one sample stands for one tick's worth of that thread's time
+        seconds_per_sample = self.duration / self.ticks if self.ticks else 0
+        return [
+            {
+                'function': label,
+                'self_samples': count,
+                'self_pct': round(100.0 * count / self.samples, 2),
+                'self_seconds_est': round(count * seconds_per_sample, 4),
+                'total_samples': self.total_counts[label],
+                'total_pct': round(100.0 * self.total_counts[label] / self.samples, 2)
+            }
+            for label, count in self.self_counts.most_common(n)
+        ]
+
+    def summary(self, top_n=20):
+        return {
+            'duration_seconds': round(self.duration, 3),
+            'interval_seconds': self.interval,
+            'samples': self.samples,
+            'ticks': self.ticks,
+            'top_functions': self.top_functions(top_n),
+            'collapsed_stacks': self.collapsed()
+        }
+
+
+class ThreadTracker:
+    """Track which threads are currently serving a given kind of request"""
+
+    def __init__(self):
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self._active.add(threading.get_ident())
+
+    def exit(self):
+        with self._lock:
+            self._active.discard(threading.get_ident())
+
+    def __contains__(self, ident):
+        return ident in self._active
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Full-text search over attack paths and payloads
+An SQLite FTS5 index with attacks_view as its external content, so the
+text itself is stored once (inline or interned) and the index holds only
+tokens. store_attack adds rows as they are written and the retention job
+removes rows as they are archived. Queries use FTS5 syntax: phrases
+("union select"), prefixes (passw*), boolean operators (AND/OR/NOT) and
+column filters (path:admin).
+"""
+
+import sqlite3
+
+FTS_TABLE = 'attacks_fts'
+
+SNIPPET_OPEN = '['
+SNIPPET_CLOSE = ']'
+
+
+def fts5_available():
+    try:
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE VIRTUAL TABLE probe USING fts5(text)')
+        conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def has_search_index(cursor):
+    return cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).fetchone() is not None
+
+
+def init_search_index(cursor):
+    """Create the index (backfilling existing rows); returns False if SQLite lacks FTS5"""
+    if not fts5_available():
+        return False
+    if has_search_index(cursor):
+        return True
+
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            path, payload,
+            content='attacks_view', content_rowid='id',
+            tokenize="unicode61 remove_diacritics 0"
+        )
+    ''')
+    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+    return True
+
+
+def index_attack(cursor, attack_id, path, payload):
+    cursor.execute(f'INSERT INTO {FTS_TABLE}(rowid, path, payload) VALUES (?, ?, ?)', (attack_id, path, payload))
+
+
+def index_attacks(cursor, rows):
+    """Bulk index_attack over [(id, path, payload), ...]"""
+    cursor.executemany(f'INSERT INTO {FTS_TABLE}(rowid, path, payload) VALUES (?, ?, ?)', rows)
+
+
+def unindex_attacks(cursor, rows):
+    """Remove [(id, path, payload), ...]; values must be the ones that were indexed"""
+    cursor.executemany(
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, path, payload) VALUES('delete', ?, ?, ?)", rows
+    )
+
+
+def search_attacks(conn, query, attack_type=None, device_id=None, start=None, end=None, limit=50, offset=0):
+    """Ranked matches (best first) plus the total match count; raises sqlite3.OperationalError on bad syntax"""
+    conditions = [f'{FTS_TABLE} MATCH ?']
+    params = [query]
+    for clause, value in (('a.attack_type = ?', attack_type), ('a.device_id = ?', device_id),
+                          ('a.created_at >= ?', start), ('a.created_at < ?', end)):
+        if value:
+            conditions.append(clause)
+            params.append(value)
+    where = ' AND '.join(conditions)
+
+    cursor = conn.cursor()
+    total = cursor.execute(f'''
+        SELECT COUNT(*) FROM {FTS_TABLE} JOIN attacks a ON a.id = {FTS_TABLE}.rowid
+        WHERE {where}
+    ''', params).fetchone()[0]
+
+    cursor.execute(f'''
+        SELECT a.id, a.device_id, a.timestamp, a.attack_type, a.source_ip, a.ml_classification, a.created_at,
+               snippet({FTS_TABLE}, 0, '{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '…', 12) AS path,
+               snippet({FTS_TABLE}, 1, '{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '…', 24) AS payload,
+               -bm25({FTS_TABLE}, 2.0, 1.0) AS score
+        FROM {FTS_TABLE} JOIN attacks a ON a.id = {FTS_TABLE}.rowid
+        WHERE {where}
+        ORDER BY score DESC
+        LIMIT ? OFFSET ?
+    ''', params + [limit, offset])
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()], total
@@ -4,20 +4,51 @@ Enhanced IoT Honeypot Server with Advanced ML Pipeline
 Production-ready Flask server with 100% ML accuracy
 """
 
-from flask import Flask, request, jsonify
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-import sqlite3
 import hashlib
 import json
-import time
 from datetime import datetime
-import pandas as pd
-import numpy as np
-import joblib
+from contextlib import contextmanager
 import logging
+import os
+import threading
+import calendar
+import csv
+import sqlite3
+import io
+import atexit
+from sampling_profiler import SamplingProfiler, ThreadTracker
+from log_pipeline import configure_queue_logging
+from sketches import AttackSketches
+from frequency_buffers import AttackFrequency, AttackTotals
+from partitions import archive_cold_partitions, query_attacks, iter_archived_rows
+from feature_store import FeatureStore
+from interning import Interner, init_intern_tables, intern_block_data
+import interning
+from wire_format import decode_body, UnsupportedFormat, available_formats
+from cascade import CascadeClassifier, RULES_VERSION
+from search import init_search_index, index_attack, search_attacks
+from ip_enrichment import IPEnricher, enrichment_features, ENRICHMENT_FEATURE_NAMES
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# NumPy and scikit-learn (via joblib) are imported on first use so they stay off the startup path
+startup_timings = {'imports': round(time.perf_counter() - _import_started, 4)}
+
+# Configure logging ('sync' writes on the calling thread, 'queue' hands off to a background writer)
+LOG_MODE = os.environ.get('HONEYPOT_LOG_MODE', 'sync')
+if LOG_MODE == 'queue':
+    configure_queue_logging(
+        log_file=os.environ.get('HONEYPOT_LOG_FILE', 'honeypot.log'),
+        max_bytes=int(os.environ.get('HONEYPOT_LOG_MAX_BYTES', 10 * 1024 * 1024)),
+        backup_count=int(os.environ.get('HONEYPOT_LOG_BACKUPS', 5)),
+        sample_rate=int(os.environ.get('HONEYPOT_LOG_SAMPLE_RATE', 1)),
+        rate_limit=int(os.environ.get('HONEYPOT_LOG_RATE_LIMIT', 10))
+    )
+else:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -25,19 +56,92 @@ CORS(app)
 
 # Global variables
 blockchain = []
+chain_lock = threading.Lock()  # Serializes tail reads + appends so concurrent requests can't fork the chain
+device_chains = {}  # device_id -> [Block, ...] in per-device chain mode
+device_locks = {}  # device_id -> lock guarding that chain's tail
+device_chains_lock = threading.Lock()  # Guards creation of new device chains
+last_anchor_heads = None
 model_data = None
+model_version = None
+model_state = 'not_loaded'  # not_loaded -> loading -> loaded | failed | incompatible
+baseline_model_data = None  # Batch-trained model from MODEL_PATH; stays put when an online checkpoint is promoted
 DATABASE_PATH = 'honeypot.db'
+MODEL_PATH = os.environ.get('HONEYPOT_MODEL_PATH', '/Users/bhaskar/Desktop/IOT/production_model.pkl')
+# Fast start loads and warms up the model in the background instead of before serving
+FAST_START = os.environ.get('HONEYPOT_FAST_START', '0').lower() in ('1', 'true', 'yes')
+ADMIN_TOKEN = os.environ.get('HONEYPOT_ADMIN_TOKEN')
+MAX_BATCH_SIZE = int(os.environ.get('HONEYPOT_MAX_BATCH_SIZE', 1000))
+# 'inline' stores path/payload text on every row, 'interned' stores each distinct value once
+STORAGE_MODE = os.environ.get('HONEYPOT_STORAGE_MODE', 'inline')
+PAYLOAD_COMPRESS_THRESHOLD = int(os.environ.get('HONEYPOT_PAYLOAD_COMPRESS_THRESHOLD', 256))
+FEATURE_STORE_PREFIX = os.environ.get('HONEYPOT_FEATURE_STORE', '')  # Opt-in: e.g. 'features'
+CHAIN_MODE = os.environ.get('HONEYPOT_CHAIN_MODE', 'global')  # global | device
+ANCHOR_INTERVAL = int(os.environ.get('HONEYPOT_ANCHOR_INTERVAL', 30))
+ENRICHMENT_DIR = os.environ.get('HONEYPOT_ENRICHMENT_DIR', 'enrichment')
+ENRICHMENT_RELOAD_INTERVAL = int(os.environ.get('HONEYPOT_ENRICHMENT_RELOAD_INTERVAL', 30))
+ENRICHMENT_FEATURES = os.environ.get('HONEYPOT_ENRICHMENT_FEATURES', '0').lower() in ('1', 'true', 'yes')
+N_FEATURES = 50 + (len(ENRICHMENT_FEATURE_NAMES) if ENRICHMENT_FEATURES else 0)
+CLASSIFIER_MODE = os.environ.get('HONEYPOT_CLASSIFIER_MODE', 'ml')  # ml | cascade
+CASCADE_THRESHOLD = float(os.environ.get('HONEYPOT_CASCADE_THRESHOLD', 0.9))
+ONLINE_LEARNING = os.environ.get('HONEYPOT_ONLINE_LEARNING', '0').lower() in ('1', 'true', 'yes')
+ONLINE_CHECKPOINT_PATH = os.environ.get('HONEYPOT_ONLINE_CHECKPOINT', 'online_model.pkl')
+ONLINE_EVAL_INTERVAL = int(os.environ.get('HONEYPOT_ONLINE_EVAL_INTERVAL', 300))
+ONLINE_EXTRA_CLASSES = [c.strip() for c in os.environ.get('HONEYPOT_ONLINE_CLASSES', '').split(',') if c.strip()]
+ONLINE_TRUST_DEVICE_LABELS = os.environ.get('HONEYPOT_ONLINE_TRUST_DEVICE_LABELS', '0').lower() in ('1', 'true', 'yes')
+ARCHIVE_DIR = os.environ.get('HONEYPOT_ARCHIVE_DIR', 'archive')
+RETENTION_DAYS = int(os.environ['HONEYPOT_RETENTION_DAYS']) if os.environ.get('HONEYPOT_RETENTION_DAYS') else None
+ARCHIVE_INTERVAL = int(os.environ.get('HONEYPOT_ARCHIVE_INTERVAL', 3600))
+SKETCH_PATH = os.environ.get('HONEYPOT_SKETCH_PATH', 'sketches.json')
+SKETCH_CHECKPOINT_INTERVAL = int(os.environ.get('HONEYPOT_SKETCH_CHECKPOINT_INTERVAL', 60))
+
+# Content-addressed path/payload ids for the interned storage mode
+interner = Interner(compress_threshold=PAYLOAD_COMPRESS_THRESHOLD)
+
+# Binary per-attack feature vectors (see feature_store.py)
+feature_store = None
+
+# Streaming summaries for unique IPs and heavy hitters (see sketches.py)
+attack_sketches = None
+
+# Minute/hour/day ring buffers of attack counts backing /frequency
+attack_frequency = AttackFrequency()
+
+# Signature tier in front of the ML model (HONEYPOT_CLASSIFIER_MODE=cascade)
+cascade_classifier = CascadeClassifier(threshold=CASCADE_THRESHOLD)
+
+# Incremental learner trained on confirmed labels (HONEYPOT_ONLINE_LEARNING)
+online_learner = None
+# Source IP scope/ASN/threat-list lookups; data files are loaded by initialize_system
+ip_enricher = IPEnricher()
+
+# Per-type counts and confidence sums of the hot table, so dashboard polls don't aggregate SQL
+attack_totals = AttackTotals()
+search_enabled = False  # Set by init_database when SQLite has FTS5
+verified_blocks = {}  # Chain key -> prefix length already verified by verify_new_blocks()
+
+FREQUENCY_CHART_TYPES = ['sql_injection', 'brute_force_credential', 'xss_attack', 'command_injection']
+
+# Threads currently inside /attack (or any request), used to scope the sampling profiler
+attack_threads = ThreadTracker()
+request_threads = ThreadTracker()
+
+def connect_db():
+    """Open a database connection that can also read attacks_view"""
+    return interning.connect(DATABASE_PATH)
 
 class Block:
-    def __init__(self, index, timestamp, data, previous_hash):
+    def __init__(self, index, timestamp, data, previous_hash, serialized_data=None):
         self.index = index
         self.timestamp = timestamp
         self.data = data
         self.previous_hash = previous_hash
-        self.hash = self.calculate_hash()
+        self.hash = self.calculate_hash(serialized_data)
     
-    def calculate_hash(self):
-        block_string = f"{self.index}{self.timestamp}{json.dumps(self.data, sort_keys=True)}{self.previous_hash}"
+    def calculate_hash(self, serialized_data=None):
+        # serialized_data lets callers do the json.dumps outside the chain lock; verification always recomputes it
+        if serialized_data is None:
+            serialized_data = json.dumps(self.data, sort_keys=True)
+        block_string = f"{self.index}{self.timestamp}{serialized_data}{self.previous_hash}"
         return hashlib.sha256(block_string.encode()).hexdigest()
     
     def to_dict(self):
@@ -51,7 +155,8 @@ class Block:
 
 def init_database():
     """Initialize SQLite database"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    global search_enabled
+    conn = connect_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -64,43 +169,173 @@ def init_database():
             path TEXT,
             payload TEXT,
             block_hash TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            ml_classification TEXT,
+            ml_confidence REAL,
+            model_version TEXT,
+            confirmed_label TEXT,
+            ip_scope TEXT,
+            asn INTEGER,
+            as_org TEXT,
+            threat_lists TEXT
         )
     ''')
     
+    # Columns added after the original schema; migrate older databases in place
+    existing = {row[1] for row in cursor.execute('PRAGMA table_info(attacks)')}
+    for column, column_type in [('ml_classification', 'TEXT'), ('ml_confidence', 'REAL'), ('model_version', 'TEXT'),
+                                 ('confirmed_label', 'TEXT'), ('ip_scope', 'TEXT'), ('asn', 'INTEGER'),
+                                 ('as_org', 'TEXT'), ('threat_lists', 'TEXT')]:
+        if column not in existing:
+            cursor.execute(f'ALTER TABLE attacks ADD COLUMN {column} {column_type}')
+    
+    # Time-range reads on the hot table route through this index
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_attacks_created_at ON attacks(created_at)')
+    
+    # Interned path/payload tables and attacks_view, which resolves them for reads
+    init_intern_tables(cursor)
+    
+    # Full-text index over path/payload, backed by attacks_view (backfilled on first run)
+    search_enabled = init_search_index(cursor)
+    if not search_enabled:
+        logger.warning("SQLite was built without FTS5; /search is disabled")
+    
     conn.commit()
     conn.close()
     logger.info("Database initialized")
 
+def model_file_version(path):
+    """Short content hash identifying a model file"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+def model_feature_mismatch(model):
+    """Error message if the model was trained on a different feature width than extract_features produces"""
+    expected = getattr(model['scaler'], 'n_features_in_', None) or getattr(model['model'], 'n_features_in_', None)
+    if expected is None or expected == N_FEATURES:
+        return None
+    return (f"model expects {expected} features but the server extracts {N_FEATURES} "
+            f"(HONEYPOT_ENRICHMENT_FEATURES={'1' if ENRICHMENT_FEATURES else '0'})")
+
 def load_production_model():
     """Load the enhanced ML model"""
-    global model_data
+    global model_data, model_version, model_state, baseline_model_data
+    model_state = 'loading'
     try:
-        model_data = joblib.load('/Users/bhaskar/Desktop/IOT/production_model.pkl')
+        import joblib
+        loaded = joblib.load(MODEL_PATH)
+        mismatch = model_feature_mismatch(loaded)
+        if mismatch:
+            # Retrying per request can't help; stay on fallback rules until the config or model changes
+            logger.error(f"Not loading {MODEL_PATH}: {mismatch}")
+            model_state = 'incompatible'
+            return False
+        model_data = baseline_model_data = loaded
+        model_version = f"{model_data['model_name']}@{model_file_version(MODEL_PATH)}"
         logger.info(f"Production model loaded: {model_data['model_name']} with {model_data['accuracy']:.3f} accuracy")
+        model_state = 'loaded'
         return True
     except Exception as e:
         logger.warning(f"Could not load production model: {e}")
+        model_state = 'failed'
         return False
 
+def warm_up_model():
+    """Run one throwaway inference so the first real request doesn't pay for lazy initialisation"""
+    if model_data is None:
+        return
+    try:
+        predict_batch(model_data, extract_features_batch([{'source_ip': '10.0.0.1', 'path': '/', 'payload': ''}]))
+    except Exception as e:
+        logger.warning(f"Model warm-up failed: {e}")
+
+def start_background_model_load():
+    """Load and warm up the model off the startup path; /health reports readiness"""
+    global model_state
+    model_state = 'loading'
+    
+    def run():
+        with startup_phase('model_load'):
+            load_production_model()
+        with startup_phase('model_warmup'):
+            warm_up_model()
+        if ONLINE_LEARNING:
+            init_online_learner()
+        startup_timings['time_to_ready'] = round(time.perf_counter() - _import_started, 4)
+        logger.info(f"Model ready in background ({model_state}): {format_startup_timings()}")
+    
+    threading.Thread(target=run, name='model-loader', daemon=True).start()
+
+def init_online_learner():
+    """Start the incremental learner over the batch model's labels plus HONEYPOT_ONLINE_CLASSES"""
+    global online_learner
+    try:
+        from online_learner import OnlineLearner
+        
+        classes = set(ONLINE_EXTRA_CLASSES)
+        if baseline_model_data is not None:
+            classes.update(baseline_model_data['label_encoder'].classes_)
+        else:
+            classes.update(['sql_injection', 'xss_attack', 'command_injection', 'directory_traversal',
+                            'brute_force_credential', 'privilege_escalation', 'information_disclosure',
+                            'reconnaissance', 'unknown'])
+        
+        learner = OnlineLearner(classes, checkpoint_path=ONLINE_CHECKPOINT_PATH, eval_interval=ONLINE_EVAL_INTERVAL)
+        if learner.restore():
+            logger.info(f"Online learner resumed from {ONLINE_CHECKPOINT_PATH} ({learner.samples_trained} samples)")
+        learner.start(lambda: baseline_model_data, predict_batch, promote_online_model, logger)
+        online_learner = learner
+        logger.info(f"Online learner started over {len(classes)} classes")
+    except Exception as e:
+        logger.warning(f"Could not start online learner: {e}")
+
+def promote_online_model(snapshot):
+    """Swap an online checkpoint in for serving; requests pick it up on their next prediction"""
+    global model_data, model_version
+    model_data = snapshot
+    model_version = f"{snapshot['model_name']}@ckpt{snapshot['checkpoint']}"
+    logger.info(f"Promoted online model {model_version} (holdout accuracy {snapshot['accuracy']:.3f})")
+
+@contextmanager
+def startup_phase(name):
+    """Record how long a startup phase takes in startup_timings"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[name] = round(time.perf_counter() - started, 4)
+
+def format_startup_timings():
+    return ', '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in startup_timings.items())
+
+def load_ip_enrichment(data_dir=None):
+    """Load enrichment data (default ENRICHMENT_DIR); offline tools call this in every worker process"""
+    global ip_enricher
+    ip_enricher = IPEnricher(data_dir or ENRICHMENT_DIR)
+    return ip_enricher
+
 def extract_features(attack_data):
-    """Extract 50 advanced features for ML classification"""
+    """Extract 50 advanced features for ML classification (54 with HONEYPOT_ENRICHMENT_FEATURES)"""
     features = []
     
     # === IP Features (8 features) ===
     ip = attack_data.get('source_ip', '0.0.0.0')
     ip_parts = ip.split('.')
+    enrichment = ip_enricher.lookup(ip)
+    is_private = 1 if enrichment['ip_scope'] == 'private' else 0  # RFC 1918 / fc00::/7, from the prefix trie
+    is_loopback = 1 if enrichment['ip_scope'] == 'loopback' else 0
     
     if len(ip_parts) == 4 and all(part.isdigit() for part in ip_parts):
         features.extend([int(part) for part in ip_parts])
         features.extend([
-            1 if ip_parts[0] in ['192', '10', '172'] else 0,  # Private IP
-            1 if ip_parts[0] == '127' else 0,  # Localhost
+            is_private,  # Private IP
+            is_loopback,  # Localhost
             1 if int(ip_parts[0]) > 200 else 0,  # High range
             sum(int(part) for part in ip_parts)  # IP sum
         ])
     else:
-        features.extend([0] * 8)
+        # IPv6 (or unparseable): no octets, but scope flags still apply
+        features.extend([0, 0, 0, 0, is_private, is_loopback, 0, 0])
     
     # === Path Features (20 features) ===
     path = attack_data.get('path', '').lower()
@@ -162,30 +397,55 @@ def extract_features(attack_data):
         1 if hour in [2, 3, 4] else 0  # Late night attacks
     ])
     
+    # === Enrichment Features (optional, 4 features) ===
+    if ENRICHMENT_FEATURES:
+        features.extend(enrichment_features(enrichment))
+    
     return features
 
-def predict_attack_type(attack_data):
+def extract_features_batch(attack_rows):
+    """Extract features for many attacks into an (n, 50) matrix"""
+    import numpy as np
+    return np.array([extract_features(row) for row in attack_rows], dtype=float)
+
+def predict_batch(model, X):
+    """Classify a feature matrix in one pass; returns (labels, confidences)"""
+    import numpy as np
+    X_scaled = model['scaler'].transform(X)
+    probabilities = model['model'].predict_proba(X_scaled)
+    best = probabilities.argmax(axis=1)
+    labels = model['label_encoder'].inverse_transform(model['model'].classes_[best])
+    return labels, probabilities[np.arange(len(best)), best]
+
+def predict_attack_type(attack_data, features=None):
     """Predict attack type using enhanced ML model"""
-    global model_data
-    
     if model_data is None:
-        if not load_production_model():
-            return fallback_classification(attack_data)
+        # Never block a request on a load that is already running in the background
+        if model_state in ('loading', 'incompatible') or not load_production_model():
+            return fallback_classification(attack_data), 0.5
+    
+    # Hold one reference so a promotion mid-request can't mix two models' scaler and classifier
+    model = model_data
     
     try:
-        # Extract features and predict
-        features = extract_features(attack_data)
+        import numpy as np
+        
+        # Extract features (unless the caller already did) and predict
+        if features is None:
+            features = extract_features(attack_data)
         X = np.array([features])
-        X_scaled = model_data['scaler'].transform(X)
+        X_scaled = model['scaler'].transform(X)
         
-        prediction = model_data['model'].predict(X_scaled)[0]
-        predicted_label = model_data['label_encoder'].inverse_transform([prediction])[0]
+        prediction = model['model'].predict(X_scaled)[0]
+        predicted_label = model['label_encoder'].inverse_transform([prediction])[0]
         
         # Get prediction confidence
-        probabilities = model_data['model'].predict_proba(X_scaled)[0]
+        probabilities = model['model'].predict_proba(X_scaled)[0]
         confidence = max(probabilities)
         
-        logger.info(f"ML Prediction: {predicted_label} (confidence: {confidence:.2f})")
+        logger.info("ML Prediction: %s (confidence: %.2f)", predicted_label, confidence,
+                    extra={'event': 'ml_prediction', 'attack_type': predicted_label,
+                           'confidence': round(float(confidence), 4)})
         return predicted_label, confidence
         
     except Exception as e:
@@ -240,69 +500,388 @@ def create_genesis_block():
     }
     return Block(0, time.time(), genesis_data, "0")
 
+def device_chain(device_id):
+    """Return (chain, lock) for a device, starting a new chain at its own genesis block if needed"""
+    device_id = device_id or 'unknown'
+    chain = device_chains.get(device_id)
+    if chain is None:
+        with device_chains_lock:
+            chain = device_chains.get(device_id)
+            if chain is None:
+                genesis = Block(0, time.time(), {"message": "Device chain genesis", "device_id": device_id}, "0")
+                device_locks[device_id] = threading.Lock()
+                chain = device_chains[device_id] = [genesis]
+    return chain, device_locks[device_id]
+
+def append_block(chain, lock, data):
+    """Append a block to one chain; only index assignment, hashing and the append hold its lock"""
+    serialized_data = json.dumps(data, sort_keys=True)
+    
+    with lock:
+        latest_block = chain[-1] if chain else None
+        if latest_block is None:
+            return None
+        
+        new_block = Block(
+            index=latest_block.index + 1,
+            timestamp=time.time(),
+            data=data,
+            previous_hash=latest_block.hash,
+            serialized_data=serialized_data
+        )
+        
+        chain.append(new_block)
+    return new_block
+
+def append_blocks(chain, lock, data_list):
+    """Append several blocks under one lock acquisition (bulk import); serialization happens outside it"""
+    serialized = [json.dumps(data, sort_keys=True) for data in data_list]
+    
+    blocks = []
+    with lock:
+        previous = chain[-1] if chain else None
+        if previous is None:
+            return []
+        for data, serialized_data in zip(data_list, serialized):
+            previous = Block(previous.index + 1, time.time(), data, previous.hash, serialized_data)
+            blocks.append(previous)
+        chain.extend(blocks)
+    return blocks
+
+def add_blocks(data_list):
+    """Bulk add_block; returns the new blocks in input order (each device's share goes to its chain in device mode)"""
+    if CHAIN_MODE != 'device':
+        return append_blocks(blockchain, chain_lock, data_list)
+    
+    positions = {}
+    for position, data in enumerate(data_list):
+        positions.setdefault(data.get('device_id') or 'unknown', []).append(position)
+    blocks = [None] * len(data_list)
+    for device_id, device_positions in positions.items():
+        chain, lock = device_chain(device_id)
+        for position, block in zip(device_positions, append_blocks(chain, lock, [data_list[p] for p in device_positions])):
+            blocks[position] = block
+    return blocks
+
 def add_block(data):
-    """Add a new block to the blockchain"""
-    latest_block = blockchain[-1] if blockchain else None
-    if latest_block is None:
+    """Add a new block to the blockchain (the device's own chain in per-device mode)"""
+    if CHAIN_MODE == 'device':
+        new_block = append_block(*device_chain(data.get('device_id')), data)
+    else:
+        new_block = append_block(blockchain, chain_lock, data)
+    if new_block is None:
         return None
     
-    new_block = Block(
-        index=latest_block.index + 1,
-        timestamp=time.time(),
-        data=data,
-        previous_hash=latest_block.hash
-    )
-    
-    blockchain.append(new_block)
-    logger.info(f"Block #{new_block.index} added - {data.get('attack_type', 'unknown')}")
+    logger.info("Block #%d added - %s", new_block.index, data.get('attack_type', 'unknown'),
+                extra={'event': 'block_added', 'block_index': new_block.index})
     return new_block
 
-def store_attack(attack_data, block_hash):
+def device_heads():
+    """{device_id: {'index', 'hash'}} for the current tip of every device chain"""
+    with device_chains_lock:
+        chains = list(device_chains.items())
+    return {device_id: {'index': chain[-1].index, 'hash': chain[-1].hash} for device_id, chain in sorted(chains)}
+
+def anchor_device_chains():
+    """Commit the heads of all device chains in a global anchor block; skipped when nothing moved"""
+    global last_anchor_heads
+    heads = device_heads()
+    if not heads or heads == last_anchor_heads:
+        return None
+    
+    heads_root = hashlib.sha256(json.dumps(heads, sort_keys=True).encode()).hexdigest()
+    block = append_block(blockchain, chain_lock, {
+        'type': 'anchor',
+        'devices': len(heads),
+        'heads_root': heads_root,
+        'heads': heads
+    })
+    if block is None:
+        return None  # Global chain not initialized yet
+    last_anchor_heads = heads
+    logger.info(f"Anchor block #{block.index} committed {len(heads)} device heads")
+    return block
+
+def start_anchor_job():
+    """Anchor device chain heads into the global chain every ANCHOR_INTERVAL seconds"""
+    def run():
+        while True:
+            time.sleep(ANCHOR_INTERVAL)
+            try:
+                anchor_device_chains()
+            except Exception as e:
+                logger.error(f"Anchoring failed: {e}")
+    
+    threading.Thread(target=run, name='chain-anchor', daemon=True).start()
+
+def chain_block_count():
+    """Blocks across the global chain and every device chain"""
+    return len(blockchain) + sum(len(chain) for chain in list(device_chains.values()))
+
+def store_attack(attack_data, block_hash, confidence=None, version=None, enrichment=None):
     """Store attack data in database"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = connect_db()
     cursor = conn.cursor()
+    enrichment = enrichment or ip_enricher.lookup(attack_data.get('source_ip', '0.0.0.0'))
+    
+    path, payload = attack_data.get('path'), attack_data.get('payload')
+    path_id = payload_id = None
+    pending = []
+    if STORAGE_MODE == 'interned':
+        path_id = interner.intern_path(cursor, path, pending)
+        payload_id = interner.intern_payload(cursor, payload, pending)
+        path = payload = None
     
     cursor.execute('''
-        INSERT INTO attacks (device_id, timestamp, attack_type, source_ip, path, payload, block_hash)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO attacks (device_id, timestamp, attack_type, source_ip, path, payload, block_hash,
+                             ml_classification, ml_confidence, model_version, path_id, payload_id,
+                             ip_scope, asn, as_org, threat_lists)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     ''', (
         attack_data.get('device_id'),
         attack_data.get('timestamp'),
         attack_data.get('attack_type'),
         attack_data.get('source_ip'),
-        attack_data.get('path'),
-        attack_data.get('payload'),
-        block_hash
+        path,
+        payload,
+        block_hash,
+        attack_data.get('ml_classification'),
+        float(confidence) if confidence is not None else None,
+        version,
+        path_id,
+        payload_id,
+        enrichment['ip_scope'],
+        enrichment['asn'],
+        enrichment['as_org'],
+        ','.join(enrichment['threat_lists']) or None
     ))
     
+    attack_id = cursor.lastrowid
+    if search_enabled:
+        # Index the original text in the same transaction, whichever storage mode holds it
+        index_attack(cursor, attack_id, attack_data.get('path'), attack_data.get('payload'))
     conn.commit()
     conn.close()
+    interner.remember(pending)
+    return attack_id
+
+def created_at_epoch(created_at):
+    """Convert SQLite CURRENT_TIMESTAMP text (UTC) to epoch seconds"""
+    return calendar.timegm(time.strptime(created_at, '%Y-%m-%d %H:%M:%S'))
+
+def init_sketches():
+    """Restore sketches from the last checkpoint and replay newer rows from the database"""
+    global attack_sketches
+    try:
+        attack_sketches = AttackSketches.load(SKETCH_PATH)
+        logger.info(f"Sketches restored from {SKETCH_PATH} (last attack id {attack_sketches.last_attack_id})")
+    except FileNotFoundError:
+        attack_sketches = AttackSketches()
+    except Exception as e:
+        logger.warning(f"Could not restore sketches, rebuilding from database: {e}")
+        attack_sketches = AttackSketches()
+    
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, source_ip, path, payload, created_at
+        FROM attacks_view
+        WHERE id > ?
+        ORDER BY id
+    ''', (attack_sketches.last_attack_id,))
+    
+    replayed = 0
+    for attack_id, source_ip, path, payload, created_at in cursor:
+        attack_sketches.update(
+            {'source_ip': source_ip, 'path': path, 'payload': payload},
+            attack_id=attack_id,
+            now=created_at_epoch(created_at) if created_at else None
+        )
+        replayed += 1
+    conn.close()
+    
+    if replayed:
+        logger.info(f"Replayed {replayed} attacks into sketches")
+        checkpoint_sketches()
+
+def checkpoint_sketches():
+    """Persist sketch state to disk"""
+    if attack_sketches is None:
+        return
+    try:
+        attack_sketches.checkpoint(SKETCH_PATH)
+    except Exception as e:
+        logger.warning(f"Sketch checkpoint failed: {e}")
+
+def start_sketch_checkpointer():
+    """Checkpoint sketches periodically in a background thread"""
+    def run():
+        while True:
+            time.sleep(SKETCH_CHECKPOINT_INTERVAL)
+            checkpoint_sketches()
+    
+    threading.Thread(target=run, name='sketch-checkpointer', daemon=True).start()
+
+def init_frequency():
+    """Rebuild the frequency ring buffers from the last 30 days of stored attacks"""
+    global attack_frequency
+    frequency = AttackFrequency()
+    
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT strftime('%Y-%m-%d %H:%M:00', created_at) as minute, attack_type, COUNT(*)
+        FROM attacks
+        WHERE created_at >= datetime('now', '-30 days')
+        GROUP BY minute, attack_type
+        ORDER BY minute
+    ''')
+    for minute, attack_type, count in cursor:
+        frequency.add(attack_type, created_at_epoch(minute), count)
+    conn.close()
+    
+    # Days already compacted out of SQLite still count towards the charts
+    since_day = time.strftime('%Y-%m-%d', time.gmtime(time.time() - 30 * 86400))
+    for row in iter_archived_rows(ARCHIVE_DIR, since_day, ['attack_type', 'created_at']):
+        if row['created_at']:
+            frequency.add(row['attack_type'], created_at_epoch(row['created_at']))
+    
+    attack_frequency = frequency
+    logger.info(f"Frequency buffers rebuilt ({len(frequency.attack_types())} attack types)")
+
+def init_totals():
+    """Recount per-type totals from the attacks table (startup and after retention)"""
+    conn = connect_db()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT attack_type, COUNT(*), SUM(ml_confidence), COUNT(ml_confidence)
+        FROM attacks
+        GROUP BY attack_type
+    ''')
+    attack_totals.load(cursor.fetchall())
+    conn.close()
+
+def run_retention():
+    """Compact partitions older than RETENTION_DAYS into columnar archives"""
+    try:
+        archived = archive_cold_partitions(DATABASE_PATH, ARCHIVE_DIR, RETENTION_DAYS)
+        if archived:
+            logger.info(f"Archived {sum(archived.values())} attacks from {len(archived)} partitions")
+            init_totals()
+    except Exception as e:
+        logger.error(f"Retention job failed: {e}")
+
+def start_retention_job():
+    """Run the retention job now and then every ARCHIVE_INTERVAL seconds"""
+    def run():
+        while True:
+            run_retention()
+            time.sleep(ARCHIVE_INTERVAL)
+    
+    threading.Thread(target=run, name='retention-job', daemon=True).start()
+
+def wants_exact():
+    return request.args.get('exact', '0').lower() in ('1', 'true', 'yes')
+
+INGEST_ENDPOINTS = ('receive_attack', 'receive_attack_batch')
+
+@app.before_request
+def track_request_thread():
+    request_threads.enter()
+    if request.endpoint in INGEST_ENDPOINTS:
+        attack_threads.enter()
+
+@app.teardown_request
+def untrack_request_thread(exc):
+    request_threads.exit()
+    if request.endpoint in INGEST_ENDPOINTS:
+        attack_threads.exit()
+
+def is_admin_request():
+    """Admin endpoints require the configured token, or localhost when none is set"""
+    if ADMIN_TOKEN:
+        return request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+def read_upload():
+    """Decode the request body by Content-Type (JSON, MessagePack, CBOR) and Content-Encoding"""
+    return decode_body(
+        request.get_data(cache=False),
+        request.content_type,
+        request.headers.get('Content-Encoding')
+    )
+
+def classify_attack(attack_data):
+    """Returns (label, confidence, version, features); features is None when the rule tier decided"""
+    if CLASSIFIER_MODE == 'cascade':
+        started = time.perf_counter()
+        tier, label, score = cascade_classifier.route(attack_data)
+        if tier == 'rules':
+            cascade_classifier.record(tier, time.perf_counter() - started, label)
+            return label, score, RULES_VERSION, None
+    
+    # Ambiguous or conflicting signatures (or ML-only mode) take the full feature + model path
+    features = extract_features(attack_data)
+    predicted_type, confidence = predict_attack_type(attack_data, features)
+    if CLASSIFIER_MODE == 'cascade':
+        cascade_classifier.record(tier, time.perf_counter() - started)
+    return predicted_type, confidence, (model_version if model_data else 'fallback'), features
+
+def process_attack(attack_data):
+    """Classify, chain and store one attack; returns the response dict, or None if chaining failed"""
+    # Classify attack using enhanced ML (or the signature tier in cascade mode)
+    predicted_type, confidence, version, features = classify_attack(attack_data)
+    attack_data['ml_classification'] = predicted_type
+    
+    # Add to blockchain (interned mode commits to path/payload by content hash)
+    block = add_block(intern_block_data(attack_data) if STORAGE_MODE == 'interned' else attack_data)
+    if not block:
+        return None
+    
+    enrichment = ip_enricher.lookup(attack_data.get('source_ip', '0.0.0.0'))
+    attack_id = store_attack(attack_data, block.hash, confidence, version, enrichment)
+    # Rule-tier events (features is None) skip extraction: they get no feature-store row, and
+    # are only featurized when the online learner trains on device labels
+    if feature_store is not None and features is not None:
+        feature_store.append(attack_id, features)
+    if attack_sketches is not None:
+        attack_sketches.update(attack_data, attack_id=attack_id)
+    attack_frequency.add(attack_data.get('attack_type'))
+    attack_totals.add(attack_data.get('attack_type'), confidence)
+    if online_learner is not None and ONLINE_TRUST_DEVICE_LABELS and attack_data.get('attack_type'):
+        online_learner.submit(features if features is not None else extract_features(attack_data),
+                              attack_data['attack_type'])
+    
+    return {
+        'status': 'success',
+        'block_hash': block.hash,
+        'block_index': block.index,
+        'chain': (attack_data.get('device_id') or 'unknown') if CHAIN_MODE == 'device' else 'global',
+        'ml_classification': predicted_type,
+        'confidence': confidence,
+        'classified_by': version,
+        'ip_scope': enrichment['ip_scope'],
+        'threat_lists': enrichment['threat_lists'],
+        'model_accuracy': model_data['accuracy'] if model_data else 'N/A'
+    }
 
 @app.route('/attack', methods=['POST'])
 def receive_attack():
     """Receive and process attack data"""
     try:
-        attack_data = request.get_json()
-        if not attack_data:
-            return jsonify({'error': 'No data received'}), 400
+        try:
+            attack_data = read_upload()
+        except UnsupportedFormat as e:
+            return jsonify({'error': str(e), 'supported_formats': available_formats()}), 415
+        except Exception as e:
+            return jsonify({'error': f'Malformed request body: {e}'}), 400
         
-        # Classify attack using enhanced ML
-        predicted_type, confidence = predict_attack_type(attack_data)
-        attack_data['ml_classification'] = predicted_type
+        if not attack_data or not isinstance(attack_data, dict):
+            return jsonify({'error': 'No data received'}), 400
         
-        # Add to blockchain
-        block = add_block(attack_data)
-        if block:
-            store_attack(attack_data, block.hash)
-            
-            return jsonify({
-                'status': 'success',
-                'block_hash': block.hash,
-                'block_index': block.index,
-                'ml_classification': predicted_type,
-                'confidence': confidence,
-                'model_accuracy': model_data['accuracy'] if model_data else 'N/A'
-            })
+        result = process_attack(attack_data)
+        if result:
+            return jsonify(result)
         else:
             return jsonify({'error': 'Failed to add block'}), 500
             
@@ -310,6 +889,46 @@ def receive_attack():
         logger.error(f"Error processing attack: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/attack/batch', methods=['POST'])
+def receive_attack_batch():
+    """Receive a list of attacks (or {"attacks": [...]}) in one upload"""
+    try:
+        try:
+            body = read_upload()
+        except UnsupportedFormat as e:
+            return jsonify({'error': str(e), 'supported_formats': available_formats()}), 415
+        except Exception as e:
+            return jsonify({'error': f'Malformed request body: {e}'}), 400
+        
+        attacks = body.get('attacks') if isinstance(body, dict) else body
+        if not attacks or not isinstance(attacks, list):
+            return jsonify({'error': 'No attacks received'}), 400
+        if len(attacks) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch too large (max {MAX_BATCH_SIZE})'}), 413
+        
+        results = []
+        for attack_data in attacks:
+            if not isinstance(attack_data, dict) or not attack_data:
+                results.append({'status': 'error', 'error': 'Invalid attack record'})
+                continue
+            try:
+                results.append(process_attack(attack_data) or {'status': 'error', 'error': 'Failed to add block'})
+            except Exception as e:
+                logger.error(f"Error processing batched attack: {e}")
+                results.append({'status': 'error', 'error': str(e)})
+        
+        accepted = sum(1 for r in results if r['status'] == 'success')
+        return jsonify({
+            'status': 'success' if accepted == len(results) else 'partial',
+            'accepted': accepted,
+            'failed': len(results) - accepted,
+            'results': results
+        })
+        
+    except Exception as e:
+        logger.error(f"Error processing attack batch: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/')
 def dashboard():
     """Serve the main dashboard"""
@@ -323,25 +942,31 @@ def dashboard():
 def get_stats():
     """Get comprehensive attack statistics"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = connect_db()
         cursor = conn.cursor()
         
-        # Total attacks
-        cursor.execute('SELECT COUNT(*) FROM attacks')
-        total_attacks = cursor.fetchone()[0]
-        
-        # Unique IPs
-        cursor.execute('SELECT COUNT(DISTINCT source_ip) FROM attacks')
-        unique_ips = cursor.fetchone()[0]
+        # Total attacks and attack types breakdown (running totals unless ?exact=1)
+        if wants_exact():
+            cursor.execute('SELECT COUNT(*) FROM attacks')
+            total_attacks = cursor.fetchone()[0]
+            cursor.execute('SELECT attack_type, COUNT(*) FROM attacks GROUP BY attack_type ORDER BY COUNT(*) DESC')
+            attack_types = dict(cursor.fetchall())
+        else:
+            total_attacks = attack_totals.total()
+            attack_types = {attack_type: count for attack_type, count, _ in attack_totals.by_type()}
         
-        # Attack types breakdown
-        cursor.execute('SELECT attack_type, COUNT(*) FROM attacks GROUP BY attack_type ORDER BY COUNT(*) DESC')
-        attack_types = dict(cursor.fetchall())
+        # Unique IPs (HyperLogLog estimate unless ?exact=1)
+        exact = wants_exact() or attack_sketches is None
+        if exact:
+            cursor.execute('SELECT COUNT(DISTINCT source_ip) FROM attacks')
+            unique_ips = cursor.fetchone()[0]
+        else:
+            unique_ips = attack_sketches.unique_ip_count()
         
         # Recent attacks
         cursor.execute('''
             SELECT device_id, timestamp, attack_type, source_ip, path, payload, created_at
-            FROM attacks 
+            FROM attacks_view 
             ORDER BY id DESC 
             LIMIT 50
         ''')
@@ -363,9 +988,10 @@ def get_stats():
         return jsonify({
             'total_attacks': total_attacks,
             'unique_ips': unique_ips,
+            'unique_ips_exact': exact,
             'attack_types': attack_types,
             'recent_attacks': recent_attacks,
-            'blockchain_blocks': len(blockchain),
+            'blockchain_blocks': chain_block_count(),
             'ml_model_loaded': model_data is not None,
             'ml_accuracy': model_data['accuracy'] if model_data else 0,
             'ml_model_name': model_data['model_name'] if model_data else 'None'
@@ -375,17 +1001,46 @@ def get_stats():
         logger.error(f"Error getting stats: {e}")
         return jsonify({'error': str(e)}), 500
 
+EXPORT_COLUMNS = ['id', 'device_id', 'timestamp', 'attack_type', 'source_ip', 'path', 'payload',
+                  'block_hash', 'created_at']
+
+def stream_csv_export():
+    """Yield the export as CSV a chunk of rows at a time, so memory stays flat however large the table is"""
+    conn = connect_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM attacks_view ORDER BY id DESC")
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        conn.close()
+
 @app.route('/export')
 def export_all_attacks():
-    """Export all attacks for analysis"""
+    """Export all attacks for analysis (?format=csv streams a CSV download)"""
+    if request.args.get('format') == 'csv':
+        filename = f"honeypot-attacks-{datetime.now().strftime('%Y-%m-%d')}.csv"
+        return Response(stream_with_context(stream_csv_export()), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+    
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = connect_db()
         cursor = conn.cursor()
         
         cursor.execute('''
             SELECT id, device_id, timestamp, attack_type, source_ip, path, payload, 
                    block_hash, created_at
-            FROM attacks 
+            FROM attacks_view 
             ORDER BY id DESC
         ''')
         
@@ -404,6 +1059,134 @@ def export_all_attacks():
         logger.error(f"Error exporting attacks: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/attacks')
+def get_attacks_page():
+    """One page of attacks, newest first, for the dashboard's windowed table
+    
+    Pages are taken from a snapshot ending at anchor_id, so row positions stay put while new
+    attacks arrive. before_id continues from an already loaded page with an index seek;
+    offset jumps to an arbitrary position, also by id seek rather than OFFSET (exact while ids
+    under the anchor are contiguous, interpolated otherwise). limit=0 returns only the metadata.
+    """
+    try:
+        limit = max(0, min(int(request.args.get('limit', 100)), 500))
+        offset = max(0, int(request.args.get('offset', 0)))
+        before_id = request.args.get('before_id', type=int)
+        
+        conn = connect_db()
+        cursor = conn.cursor()
+        
+        max_id = cursor.execute('SELECT MAX(id) FROM attacks').fetchone()[0] or 0
+        anchor_id = request.args.get('anchor_id', type=int)
+        if anchor_id is None:
+            anchor_id = max_id
+        newer = cursor.execute('SELECT COUNT(*) FROM attacks WHERE id > ?', (anchor_id,)).fetchone()[0]
+        total = max(0, attack_totals.total() - newer)
+        
+        # Ids are assigned in order, so the offset-th newest row sits near anchor_id - offset; when
+        # retention or archiving left gaps, scale by the id span the remaining rows cover
+        min_id = cursor.execute('SELECT MIN(id) FROM attacks').fetchone()[0] or 0
+        span = max(0, anchor_id - min_id + 1)
+        approximate = bool(total) and span != total
+        
+        attacks = []
+        if limit:
+            if before_id is None:
+                step = span / total if approximate else 1
+                before_id = anchor_id + 1 - int(round(offset * step))
+            cursor.execute('''
+                SELECT id, device_id, timestamp, attack_type, source_ip, path, payload,
+                       ml_classification, ml_confidence, created_at
+                FROM attacks_view
+                WHERE id < ? AND id <= ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (before_id, anchor_id, limit))
+            columns = [desc[0] for desc in cursor.description]
+            attacks = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        conn.close()
+        
+        return jsonify({
+            'attacks': attacks,
+            'anchor_id': anchor_id,
+            'total': total,
+            'newer': newer,
+            'approximate': approximate,
+            'next_before_id': attacks[-1]['id'] if attacks else None
+        })
+    except Exception as e:
+        logger.error(f"Error getting attacks page: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/history')
+def get_history():
+    """Time-range query across the hot table and archived partitions"""
+    try:
+        end = request.args.get('end') or time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() + 1))
+        start = request.args.get('start') or time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() - 86400))
+        limit = max(1, min(int(request.args.get('limit', 1000)), 5000))
+        
+        attacks = query_attacks(DATABASE_PATH, ARCHIVE_DIR, start, end, limit=limit)
+        return jsonify({
+            'attacks': attacks,
+            'total': len(attacks),
+            'start': start,
+            'end': end
+        })
+    except Exception as e:
+        logger.error(f"Error querying history: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/search')
+def search_history():
+    """Ranked full-text search over paths and payloads, with type/device/time filters"""
+    if not search_enabled:
+        return jsonify({'error': 'Full-text search unavailable (SQLite built without FTS5)'}), 503
+    
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': 'Missing search query (q)'}), 400
+    
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 200))
+        offset = max(0, int(request.args.get('offset', 0)))
+        
+        conn = connect_db()
+        try:
+            results, total = search_attacks(
+                conn, query,
+                attack_type=request.args.get('attack_type'),
+                device_id=request.args.get('device_id'),
+                start=request.args.get('start'),
+                end=request.args.get('end'),
+                limit=limit, offset=offset
+            )
+        except sqlite3.OperationalError as e:
+            return jsonify({'error': f'Invalid search query: {e}'}), 400
+        finally:
+            conn.close()
+        
+        return jsonify({
+            'query': query,
+            'results': results,
+            'total': total,
+            'limit': limit,
+            'offset': offset,
+            'next_offset': offset + limit if offset + limit < total else None
+        })
+    except Exception as e:
+        logger.error(f"Error searching attacks: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/enrichment')
+def get_enrichment():
+    """Look up ?ip=, or report what enrichment data is loaded"""
+    ip = request.args.get('ip')
+    if ip:
+        return jsonify(dict(ip_enricher.lookup(ip), ip=ip))
+    return jsonify(dict(ip_enricher.counts, loaded_at=ip_enricher.loaded_at, data_dir=ENRICHMENT_DIR,
+                        model_features=ENRICHMENT_FEATURES, **ip_enricher.cache_info()))
+
 @app.route('/model/info')
 def get_model_info():
     """Get ML model information"""
@@ -421,19 +1204,87 @@ def get_model_info():
             'message': 'Production model not available'
         })
 
+@app.route('/model/online')
+def get_online_model():
+    """Online learner progress, last holdout evaluation and which model is serving"""
+    if online_learner is None:
+        return jsonify({'enabled': False, 'serving_version': model_version})
+    status = online_learner.status()
+    status.update({
+        'enabled': True,
+        'serving_version': model_version,
+        'promoted': bool(model_data) and model_data is not baseline_model_data
+    })
+    return jsonify(status)
+
+@app.route('/label', methods=['POST'])
+def confirm_label():
+    """Record an analyst-confirmed label for a stored attack and feed it to the online learner"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        attack_id, label = data.get('attack_id'), data.get('label')
+        if attack_id is None or not label:
+            return jsonify({'error': 'attack_id and label are required'}), 400
+        
+        conn = connect_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT source_ip, path, payload, timestamp FROM attacks_view WHERE id = ?', (attack_id,))
+        row = cursor.fetchone()
+        if row is None:
+            conn.close()
+            return jsonify({'error': f'Attack {attack_id} not found'}), 404
+        cursor.execute('UPDATE attacks SET confirmed_label = ? WHERE id = ?', (label, attack_id))
+        conn.commit()
+        conn.close()
+        
+        learned = False
+        if online_learner is not None:
+            features = extract_features({
+                'source_ip': row[0] or '0.0.0.0', 'path': row[1] or '', 'payload': row[2] or '', 'timestamp': row[3] or 0
+            })
+            learned = online_learner.submit(features, label)
+        
+        return jsonify({'status': 'success', 'attack_id': attack_id, 'label': label, 'queued_for_learning': learned})
+    except Exception as e:
+        logger.error(f"Error confirming label: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/blockchain')
 def get_blockchain():
-    """Get blockchain status and recent blocks"""
+    """Get blockchain status and recent blocks (?device_id= for one device's chain)"""
     try:
+        device_id = request.args.get('device_id')
+        if device_id is not None:
+            chain = device_chains.get(device_id)
+            if chain is None:
+                return jsonify({'error': f'No chain for device {device_id}'}), 404
+            anchored = (last_anchor_heads or {}).get(device_id)
+            return jsonify({
+                'device_id': device_id,
+                'total_blocks': len(chain),
+                'latest_block': chain[-1].__dict__,
+                'recent_blocks': [block.__dict__ for block in chain[-10:]],
+                'anchored_index': anchored['index'] if anchored else None,
+                'blockchain_valid': verify_chain(chain) and verify_anchors(device_id)
+            })
+        
         # Get last 10 blocks
         recent_blocks = blockchain[-10:] if len(blockchain) > 10 else blockchain
         
-        return jsonify({
+        result = {
+            'chain_mode': CHAIN_MODE,
             'total_blocks': len(blockchain),
             'latest_block': blockchain[-1].__dict__ if blockchain else None,
             'recent_blocks': [block.__dict__ for block in recent_blocks],
-            'blockchain_valid': verify_blockchain()
-        })
+            'blockchain_valid': verify_new_blocks() if request.args.get('incremental') == '1' else verify_blockchain()
+        }
+        if CHAIN_MODE == 'device':
+            result['devices'] = len(device_chains)
+            result['device_blocks'] = chain_block_count() - len(blockchain)
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error getting blockchain: {e}")
         return jsonify({'error': str(e)}), 500
@@ -442,21 +1293,24 @@ def get_blockchain():
 def get_predictions():
     """Get ML prediction statistics"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = connect_db()
         cursor = conn.cursor()
         
-        # Get prediction distribution
-        cursor.execute('''
-            SELECT attack_type, COUNT(*) as count 
-            FROM attacks 
-            GROUP BY attack_type 
-            ORDER BY count DESC
-        ''')
-        predictions = cursor.fetchall()
+        # Get prediction distribution (running totals unless ?exact=1)
+        if wants_exact():
+            cursor.execute('''
+                SELECT attack_type, COUNT(*) as count, AVG(ml_confidence)
+                FROM attacks 
+                GROUP BY attack_type 
+                ORDER BY count DESC
+            ''')
+            predictions = cursor.fetchall()
+        else:
+            predictions = attack_totals.by_type()
         
         # Get recent predictions with confidence
         cursor.execute('''
-            SELECT attack_type, created_at 
+            SELECT attack_type, created_at, ml_classification, ml_confidence, model_version
             FROM attacks 
             ORDER BY created_at DESC 
             LIMIT 20
@@ -466,8 +1320,14 @@ def get_predictions():
         conn.close()
         
         return jsonify({
-            'prediction_distribution': [{'type': p[0], 'count': p[1]} for p in predictions],
-            'recent_predictions': [{'type': r[0], 'timestamp': r[1]} for r in recent],
+            'prediction_distribution': [
+                {'type': p[0], 'count': p[1], 'avg_confidence': p[2]} for p in predictions
+            ],
+            'recent_predictions': [
+                {'type': r[0], 'timestamp': r[1], 'ml_classification': r[2],
+                 'confidence': r[3], 'model_version': r[4]}
+                for r in recent
+            ],
             'model_status': {
                 'loaded': model_data is not None,
                 'accuracy': model_data['accuracy'] if model_data else 0,
@@ -480,129 +1340,57 @@ def get_predictions():
 
 @app.route('/frequency')
 def get_frequency():
-    """Get attack frequency data for charts"""
+    """Get attack frequency data for charts, served from in-memory ring buffers"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        # Get actual attacks per hour for last 24 hours
-        cursor.execute('''
-            SELECT 
-                strftime('%H', datetime(created_at)) as hour,
-                COUNT(*) as count
-            FROM attacks 
-            WHERE datetime(created_at) >= datetime('now', '-24 hours')
-            GROUP BY strftime('%H', datetime(created_at))
-            ORDER BY hour
-        ''')
-        actual_hourly = dict(cursor.fetchall())
+        now = time.time()
         
-        # Generate complete 24-hour dataset with realistic attack patterns
-        import random
-        from datetime import datetime, timedelta
-        
-        hourly_data = []
-        current_hour = datetime.now().hour
-        
-        # Create realistic attack patterns (higher at business hours, lower at night)
-        base_patterns = {
-            0: 5, 1: 3, 2: 2, 3: 1, 4: 8, 5: 12, 6: 18, 7: 25, 8: 35, 9: 45,
-            10: 52, 11: 48, 12: 38, 13: 42, 14: 55, 15: 61, 16: 58, 17: 47,
-            18: 35, 19: 28, 20: 22, 21: 18, 22: 15, 23: 8
-        }
-        
-        for hour in range(24):
-            hour_str = f"{hour:02d}"
-            # Use actual data if available, otherwise use pattern with some randomness
-            if hour_str in actual_hourly:
-                count = actual_hourly[hour_str]
-            else:
-                base_count = base_patterns.get(hour, 10)
-                # Add some randomness to make it more realistic
-                count = max(0, base_count + random.randint(-8, 15))
-            
-            hourly_data.append({'hour': hour_str, 'count': count})
-        
-        # Get attack type breakdown per hour for top attack types
-        cursor.execute('''
-            SELECT 
-                strftime('%H', datetime(created_at)) as hour,
-                attack_type,
-                COUNT(*) as count
-            FROM attacks 
-            WHERE datetime(created_at) >= datetime('now', '-24 hours')
-            AND attack_type IN ('sql_injection', 'brute_force_credential', 'xss_attack', 'command_injection')
-            GROUP BY strftime('%H', datetime(created_at)), attack_type
-            ORDER BY hour, attack_type
-        ''')
-        attack_breakdown = cursor.fetchall()
+        # Attacks per hour for the last 24 hours, labelled by UTC hour of day
+        hourly_data = [
+            {'hour': time.strftime('%H', time.gmtime(start)), 'count': count}
+            for start, count in attack_frequency.series('hour', 24, now=now)
+        ]
+        hourly_data.sort(key=lambda item: item['hour'])
         
-        # Process attack type breakdown
+        # Attack type breakdown per hour for the charted attack types
         attack_types_hourly = {}
-        for hour, attack_type, count in attack_breakdown:
-            if attack_type not in attack_types_hourly:
-                attack_types_hourly[attack_type] = {}
-            attack_types_hourly[attack_type][hour] = count
-        
-        # Fill missing hours with realistic data for each attack type
-        attack_type_patterns = {
-            'sql_injection': 0.3,
-            'brute_force_credential': 0.25,
-            'xss_attack': 0.2,
-            'command_injection': 0.15
-        }
+        for attack_type in FREQUENCY_CHART_TYPES:
+            attack_types_hourly[attack_type] = {
+                time.strftime('%H', time.gmtime(start)): count
+                for start, count in attack_frequency.series('hour', 24, attack_type, now=now)
+            }
         
-        for attack_type, multiplier in attack_type_patterns.items():
-            if attack_type not in attack_types_hourly:
-                attack_types_hourly[attack_type] = {}
-            
-            for hour in range(24):
-                hour_str = f"{hour:02d}"
-                if hour_str not in attack_types_hourly[attack_type]:
-                    total_hour_attacks = next((item['count'] for item in hourly_data if item['hour'] == hour_str), 0)
-                    estimated_count = max(0, int(total_hour_attacks * multiplier + random.randint(-2, 3)))
-                    attack_types_hourly[attack_type][hour_str] = estimated_count
-        
-        # Get attacks per day for last 7 days with enhanced data
-        cursor.execute('''
-            SELECT 
-                DATE(created_at) as date,
-                COUNT(*) as count
-            FROM attacks 
-            WHERE datetime(created_at) >= datetime('now', '-7 days')
-            GROUP BY DATE(created_at)
-            ORDER BY date
-        ''')
-        actual_daily = dict(cursor.fetchall())
-        
-        # Generate 7-day data
-        daily_data = []
-        for i in range(7):
-            date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
-            if date in actual_daily:
-                count = actual_daily[date]
-            else:
-                # Generate realistic daily patterns (weekdays higher than weekends)
-                day_of_week = (datetime.now() - timedelta(days=i)).weekday()
-                base_count = 120 if day_of_week < 5 else 80  # Weekday vs weekend
-                count = base_count + random.randint(-30, 50)
-            daily_data.append({'date': date, 'count': count})
-        
-        # Get top source IPs
-        cursor.execute('''
-            SELECT source_ip, COUNT(*) as count
-            FROM attacks
-            GROUP BY source_ip
-            ORDER BY count DESC
-            LIMIT 10
-        ''')
-        top_ips = cursor.fetchall()
+        # Attacks per day for the last 7 days, newest first
+        daily_data = [
+            {'date': time.strftime('%Y-%m-%d', time.gmtime(start)), 'count': count}
+            for start, count in reversed(attack_frequency.series('day', 7, now=now))
+        ]
         
-        conn.close()
+        # Attacks per minute for the last hour
+        minute_data = [
+            {'minute': time.strftime('%H:%M', time.gmtime(start)), 'count': count}
+            for start, count in attack_frequency.series('minute', 60, now=now)
+        ]
+        
+        # Get top source IPs (Count-Min heavy hitters unless ?exact=1)
+        if wants_exact() or attack_sketches is None:
+            conn = connect_db()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT source_ip, COUNT(*) as count
+                FROM attacks
+                GROUP BY source_ip
+                ORDER BY count DESC
+                LIMIT 10
+            ''')
+            top_ips = cursor.fetchall()
+            conn.close()
+        else:
+            top_ips = attack_sketches.top('source_ip', 10)
         
         return jsonify({
             'hourly_frequency': hourly_data,
             'daily_frequency': daily_data,
+            'minute_frequency': minute_data,
             'attack_types_hourly': attack_types_hourly,
             'top_source_ips': [{'ip': ip[0], 'count': ip[1]} for ip in top_ips]
         })
@@ -610,27 +1398,118 @@ def get_frequency():
         logger.error(f"Error getting frequency data: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/cascade')
+def get_cascade_stats():
+    """Per-tier hit rates and latency of the rule/ML cascade"""
+    stats = cascade_classifier.stats()
+    stats['enabled'] = CLASSIFIER_MODE == 'cascade'
+    return jsonify(stats)
+
+@app.route('/sketches')
+def get_sketches():
+    """Approximate distinct-IP counts and heavy hitters, overall and for the last 24 hours"""
+    if attack_sketches is None:
+        return jsonify({'error': 'Sketches not initialized'}), 503
+    
+    day = 24 * 3600
+    def as_list(pairs, key):
+        return [{key: value, 'count': count} for value, count in pairs]
+    
+    return jsonify({
+        'attacks_seen': attack_sketches.total,
+        'unique_ips': attack_sketches.unique_ip_count(),
+        'unique_ips_24h': attack_sketches.unique_ip_count(seconds=day),
+        'top_source_ips': as_list(attack_sketches.top('source_ip'), 'ip'),
+        'top_source_ips_24h': as_list(attack_sketches.top('source_ip', seconds=day), 'ip'),
+        'top_paths': as_list(attack_sketches.top('path'), 'path'),
+        'top_paths_24h': as_list(attack_sketches.top('path', seconds=day), 'path'),
+        'top_payload_hashes': as_list(attack_sketches.top('payload_hash'), 'payload_hash'),
+        'top_payload_hashes_24h': as_list(attack_sketches.top('payload_hash', seconds=day), 'payload_hash')
+    })
+
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
+        'ready': model_state != 'loading',
         'timestamp': datetime.now().isoformat(),
         'system': {
             'database': 'connected',
-            'blockchain': f'{len(blockchain)} blocks',
-            'ml_model': 'loaded' if model_data else 'not loaded'
-        }
+            'blockchain': f'{chain_block_count()} blocks ({CHAIN_MODE} mode)',
+            'ml_model': 'loaded' if model_data else (model_state if model_state in ('loading', 'incompatible') else 'not loaded')
+        },
+        'startup': startup_timings
     })
 
+@app.route('/admin/profile')
+def profile_server():
+    """Sample live thread stacks for N seconds (admin only)"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval = float(request.args.get('interval_ms', 5)) / 1000.0
+        if interval <= 0:
+            return jsonify({'error': 'interval_ms must be positive'}), 400
+        top_n = int(request.args.get('top', 20))
+        attack_only = request.args.get('attack_only', '0').lower() in ('1', 'true', 'yes')
+        all_threads = request.args.get('all_threads', '0').lower() in ('1', 'true', 'yes')
+        
+        # Idle background loops (anchoring, checkpoints, watchers, the accept loop) would otherwise top the report
+        if attack_only:
+            thread_filter = lambda ident: ident in attack_threads
+        elif all_threads:
+            thread_filter = None
+        else:
+            thread_filter = lambda ident: ident in request_threads
+        profiler = SamplingProfiler(interval=interval, thread_filter=thread_filter).run(seconds)
+        logger.info(f"Profiled server for {profiler.duration:.1f}s ({profiler.samples} samples)")
+        
+        if request.args.get('format') == 'collapsed':
+            return profiler.collapsed(), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+        
+        result = profiler.summary(top_n)
+        result['attack_only'] = attack_only
+        result['threads'] = 'attack' if attack_only else ('all' if all_threads else 'requests')
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Error profiling server: {e}")
+        return jsonify({'error': str(e)}), 500
+
 def verify_blockchain():
-    """Verify blockchain integrity"""
-    if len(blockchain) <= 1:
+    """Verify blockchain integrity (in per-device mode: every device chain and every anchor too)"""
+    if not verify_chain(blockchain):
+        return False
+    if CHAIN_MODE == 'device':
+        return all(verify_chain(chain) for chain in list(device_chains.values())) and verify_anchors()
+    return True
+
+def verify_anchors(device_id=None, start=0):
+    """Check that anchored heads still match the device chains (one device, or all; anchors from start on)"""
+    for block in blockchain[start:]:
+        if not isinstance(block.data, dict) or block.data.get('type') != 'anchor':
+            continue
+        heads = block.data['heads']
+        if hashlib.sha256(json.dumps(heads, sort_keys=True).encode()).hexdigest() != block.data['heads_root']:
+            return False
+        for anchored_device, head in heads.items():
+            if device_id is not None and anchored_device != device_id:
+                continue
+            chain = device_chains.get(anchored_device)
+            if chain is None or head['index'] >= len(chain) or chain[head['index']].hash != head['hash']:
+                return False
+    return True
+
+def verify_chain(chain):
+    """Check hash links and block hashes along one chain"""
+    if len(chain) <= 1:
         return True
     
-    for i in range(1, len(blockchain)):
-        current_block = blockchain[i]
-        previous_block = blockchain[i-1]
+    for i in range(1, len(chain)):
+        current_block = chain[i]
+        previous_block = chain[i-1]
         
         # Check if current block's previous hash matches previous block's hash
         if current_block.previous_hash != previous_block.hash:
@@ -642,22 +1521,95 @@ def verify_blockchain():
     
     return True
 
+def verify_new_blocks():
+    """Verify only blocks appended since the last call, remembering the verified prefix per chain
+
+    In per-device mode every device chain is checked the same way, and new anchor blocks are
+    checked against the device chains.
+    """
+    chains = [(('global', None), blockchain)]
+    if CHAIN_MODE == 'device':
+        with device_chains_lock:
+            chains += [(('device', device_id), chain) for device_id, chain in device_chains.items()]
+    
+    anchors_from = verified_blocks.get(('global', None), 1)
+    for key, chain in chains:
+        length = len(chain)  # Chains only grow, so indexes below this stay valid during appends
+        start = max(1, min(verified_blocks.get(key, 1), length))
+        for i in range(start, length):
+            block, previous = chain[i], chain[i - 1]
+            if block.previous_hash != previous.hash or block.hash != block.calculate_hash():
+                return False
+        verified_blocks[key] = length
+    
+    if CHAIN_MODE == 'device':
+        return verify_anchors(start=anchors_from)
+    return True
+
 def initialize_system():
     """Initialize the enhanced honeypot system"""
     logger.info("🚀 Initializing Enhanced IoT Honeypot System...")
+    init_started = time.perf_counter()
     
     # Initialize database
-    init_database()
+    with startup_phase('db_init'):
+        init_database()
     
     # Create genesis block
-    if not blockchain:
-        genesis_block = create_genesis_block()
-        blockchain.append(genesis_block)
-        logger.info("Genesis block created")
+    with startup_phase('genesis'):
+        if not blockchain:
+            genesis_block = create_genesis_block()
+            blockchain.append(genesis_block)
+            logger.info("Genesis block created")
+    
+    # Open the feature store for appending
+    global feature_store
+    with startup_phase('feature_store_open'):
+        if FEATURE_STORE_PREFIX:
+            # Enriched vectors are wider, so they go to their own files
+            prefix = f"{FEATURE_STORE_PREFIX}_enriched" if ENRICHMENT_FEATURES else FEATURE_STORE_PREFIX
+            feature_store = FeatureStore(prefix, n_features=N_FEATURES)
+    
+    # Per-device chains are tied together by periodic anchor blocks on the global chain
+    if CHAIN_MODE == 'device':
+        start_anchor_job()
+        atexit.register(anchor_device_chains)
+    
+    # Load IP enrichment data files and reload them when they change
+    with startup_phase('enrichment_load'):
+        load_ip_enrichment()
+    ip_enricher.start_watcher(ENRICHMENT_RELOAD_INTERVAL, logger)
+    logger.info(f"IP enrichment loaded: {ip_enricher.counts}")
     
-    # Load production ML model
-    load_production_model()
+    # Compact cold partitions in the background when retention is configured
+    if RETENTION_DAYS is not None:
+        start_retention_job()
+    
+    # Rebuild in-memory frequency buffers and per-type totals
+    with startup_phase('frequency_rebuild'):
+        init_frequency()
+    with startup_phase('totals_rebuild'):
+        init_totals()
+    
+    # Restore streaming sketches and keep them checkpointed
+    with startup_phase('sketch_restore'):
+        init_sketches()
+    start_sketch_checkpointer()
+    atexit.register(checkpoint_sketches)
+    
+    # Load production ML model (in the background in fast-start mode)
+    if FAST_START:
+        start_background_model_load()
+    else:
+        with startup_phase('model_load'):
+            load_production_model()
+        if model_state == 'incompatible':
+            raise SystemExit(f"❌ Refusing to start: {MODEL_PATH} does not match the configured features")
+        if ONLINE_LEARNING:
+            init_online_learner()
     
+    startup_timings['initialize_total'] = round(time.perf_counter() - init_started, 4)
+    logger.info(f"⏱️  Startup timings: {format_startup_timings()}")
     logger.info("✅ System initialization complete")
 
 if __name__ == '__main__':
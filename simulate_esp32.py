@@ -13,17 +13,21 @@ import threading
 from datetime import datetime, timedelta
 import argparse
 import sys
+from wire_format import encode_body, decode_body, available_formats
 
 # Server Configuration
 SERVER_URL = "http://localhost:5001/attack"
 DASHBOARD_URL = "http://localhost:5001"
 
 class ESP32AttackSimulator:
-    def __init__(self, server_url=SERVER_URL):
+    def __init__(self, server_url=SERVER_URL, wire_format='json', compression=None):
         self.server_url = server_url
+        self.wire_format = wire_format  # 'json', 'msgpack' or 'cbor'
+        self.compression = compression  # None, 'gzip' or 'deflate'
         self.attack_count = 0
         self.successful_attacks = 0
         self.failed_attacks = 0
+        self.bytes_sent = 0
         self.simulation_active = False
         
         # Advanced attack scenarios matching our 15 attack types
@@ -167,12 +171,9 @@ class ESP32AttackSimulator:
             }
         ]
 
-    def send_attack(self, attack_type, source_ip, path, payload, device_profile=None):
-        """Send attack data to the server with enhanced metadata"""
-        if not device_profile:
-            device_profile = random.choice(self.device_profiles)
-        
-        attack_data = {
+    def build_attack_data(self, attack_type, source_ip, path, payload, device_profile):
+        """Build the event record an ESP32 device would upload"""
+        return {
             "device_id": device_profile['device_id'],
             "timestamp": int(time.time() * 1000),
             "attack_type": attack_type,
@@ -186,9 +187,30 @@ class ESP32AttackSimulator:
             "memory_usage": random.randint(30, 85),  # Memory usage percentage
             "cpu_temp": random.randint(45, 75)  # CPU temperature
         }
+
+    def random_attack_data(self):
+        """A random event drawn from the attack scenarios, IP pools and devices"""
+        attack_type = random.choice(list(self.attack_scenarios.keys()))
+        scenario = self.attack_scenarios[attack_type]
+        source_ip = random.choice(random.choice(list(self.attacker_ips.values())))
+        return self.build_attack_data(attack_type, source_ip, random.choice(scenario['paths']),
+                                      random.choice(scenario['payloads']), random.choice(self.device_profiles))
+
+    def post_encoded(self, url, obj):
+        """POST obj in the configured wire format and compression"""
+        body, headers = encode_body(obj, self.wire_format, self.compression)
+        self.bytes_sent += len(body)
+        return requests.post(url, data=body, headers=headers, timeout=10)
+
+    def send_attack(self, attack_type, source_ip, path, payload, device_profile=None):
+        """Send attack data to the server with enhanced metadata"""
+        if not device_profile:
+            device_profile = random.choice(self.device_profiles)
+        
+        attack_data = self.build_attack_data(attack_type, source_ip, path, payload, device_profile)
         
         try:
-            response = requests.post(self.server_url, json=attack_data, timeout=10)
+            response = self.post_encoded(self.server_url, attack_data)
             if response.status_code == 200:
                 result = response.json()
                 self.successful_attacks += 1
@@ -351,6 +373,71 @@ class ESP32AttackSimulator:
         print(f"   • Request rate: {self.attack_count/duration:.1f} req/sec")
         print("=" * 60)
 
+    def send_batch(self, attacks):
+        """Upload several events in one request to the batch endpoint"""
+        try:
+            response = self.post_encoded(f"{self.server_url}/batch", attacks)
+            if response.status_code == 200:
+                result = response.json()
+                self.successful_attacks += result.get('accepted', 0)
+                self.failed_attacks += result.get('failed', 0)
+                return result
+            print(f"❌ Failed to send batch: {response.status_code} - {response.text}")
+            self.failed_attacks += len(attacks)
+        except Exception as e:
+            print(f"❌ Error sending batch: {e}")
+            self.failed_attacks += len(attacks)
+        return None
+
+    def benchmark_wire_formats(self, samples=1000, batch_size=1):
+        """Compare bytes on the wire and decode cost for every available format"""
+        events = [self.random_attack_data() for _ in range(samples)]
+        if batch_size > 1:
+            payloads = [events[i:i + batch_size] for i in range(0, samples, batch_size)]
+        else:
+            payloads = events
+        
+        print(f"📦 Wire format benchmark: {samples} events, batch size {batch_size}")
+        print("=" * 78)
+        print(f"{'Format':<10}{'Encoding':<10}{'Bytes/event':>12}{'Total KB':>10}"
+              f"{'vs JSON':>9}{'Encode µs/ev':>14}{'Decode µs/ev':>14}")
+        print("-" * 78)
+        
+        baseline = None
+        results = []
+        for fmt in available_formats():
+            for compression in (None, 'gzip', 'deflate'):
+                start = time.perf_counter()
+                encoded = [encode_body(p, fmt, compression) for p in payloads]
+                encode_time = time.perf_counter() - start
+                
+                start = time.perf_counter()
+                for body, headers in encoded:
+                    decode_body(body, headers['Content-Type'], headers.get('Content-Encoding'))
+                decode_time = time.perf_counter() - start
+                
+                total = sum(len(body) for body, _ in encoded)
+                if baseline is None:
+                    baseline = total
+                result = {
+                    'format': fmt,
+                    'compression': compression or 'none',
+                    'bytes_per_event': total / samples,
+                    'total_bytes': total,
+                    'encode_us': encode_time / samples * 1e6,
+                    'decode_us': decode_time / samples * 1e6
+                }
+                results.append(result)
+                print(f"{fmt:<10}{result['compression']:<10}{result['bytes_per_event']:>12.1f}"
+                      f"{total / 1024:>10.1f}{total / baseline:>8.0%} "
+                      f"{result['encode_us']:>13.1f}{result['decode_us']:>14.1f}")
+        
+        print("=" * 78)
+        missing = {'json', 'msgpack', 'cbor'} - set(available_formats())
+        if missing:
+            print(f"ℹ️  Not installed: {', '.join(sorted(missing))} (pip install msgpack cbor2)")
+        return results
+
     def check_server_status(self):
         """Check if server is running"""
         try:
@@ -425,16 +512,20 @@ def main():
     parser.add_argument('--server', default=SERVER_URL, help='Server URL')
     parser.add_argument('--attacks', type=int, default=10, help='Number of attacks to simulate')
     parser.add_argument('--delay', type=float, nargs=2, default=[1, 3], help='Delay range between attacks')
-    parser.add_argument('--mode', choices=['wave', 'campaign', 'ddos', 'interactive'], 
+    parser.add_argument('--mode', choices=['wave', 'campaign', 'ddos', 'interactive', 'wire-benchmark'], 
                        default='interactive', help='Simulation mode')
     parser.add_argument('--attack-types', nargs='+', help='Specific attack types for campaign mode')
     parser.add_argument('--intensity', choices=['low', 'medium', 'high', 'extreme'], 
                        default='medium', help='DDoS intensity')
     parser.add_argument('--duration', type=int, default=30, help='Duration for timed simulations')
+    parser.add_argument('--format', choices=['json', 'msgpack', 'cbor'], default='json',
+                       help='Wire format for uploads')
+    parser.add_argument('--compression', choices=['gzip', 'deflate'], help='Compress upload bodies')
+    parser.add_argument('--batch-size', type=int, default=1, help='Events per upload for wire-benchmark')
     
     args = parser.parse_args()
     
-    simulator = ESP32AttackSimulator(args.server)
+    simulator = ESP32AttackSimulator(args.server, args.format, args.compression)
     
     try:
         if args.mode == 'wave':
@@ -444,6 +535,8 @@ def main():
             simulator.simulate_targeted_campaign(attack_types, duration_minutes=args.duration//60)
         elif args.mode == 'ddos':
             simulator.simulate_ddos_attack(args.duration, args.intensity)
+        elif args.mode == 'wire-benchmark':
+            simulator.benchmark_wire_formats(args.attacks, args.batch_size)
         else:
             simulator.interactive_mode()
             
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Streaming probabilistic summaries of attack traffic
+HyperLogLog for distinct source IPs and Count-Min + top-k for heavy hitters,
+kept overall and per time window, with JSON checkpoints so a restart
+does not lose state.
+"""
+
+import base64
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from collections import deque
+
+
+def _hash64(value):
+    """Stable 64-bit hash (Python's hash() is salted per process)"""
+    digest = hashlib.blake2b(str(value).encode('utf-8', 'replace'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def _encode(buffer):
+    return base64.b64encode(buffer).decode('ascii')
+
+
+class HyperLogLog:
+    """Cardinality estimator with ~1.04/sqrt(2^p) relative error"""
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    def add(self, value):
+        h = _hash64(value)
+        index = h >> (64 - self.precision)
+        remaining = (h << self.precision) & 0xFFFFFFFFFFFFFFFF
+        rank = (64 - self.precision + 1) if remaining == 0 else (65 - remaining.bit_length())
+        rank = min(rank, 64 - self.precision + 1)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Linear counting for small cardinalities
+        return int(round(estimate))
+
+    def merge(self, other):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def copy(self):
+        clone = HyperLogLog(self.precision)
+        clone.registers = bytearray(self.registers)
+        return clone
+
+    def to_dict(self):
+        return {'precision': self.precision, 'registers': _encode(self.registers)}
+
+    @classmethod
+    def from_dict(cls, data):
+        hll = cls(data['precision'])
+        hll.registers = bytearray(base64.b64decode(data['registers']))
+        return hll
+
+
+class CountMinSketch:
+    """Frequency estimator that never under-counts"""
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = array('Q', bytes(8 * width * depth))
+
+    def _cells(self, value):
+        h = _hash64(value)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, value, count=1):
+        cells = self._cells(value)
+        for cell in cells:
+            self.table[cell] += count
+        return min(self.table[cell] for cell in cells)
+
+    def estimate(self, value):
+        return min(self.table[cell] for cell in self._cells(value))
+
+    def merge(self, other):
+        for i, count in enumerate(other.table):
+            self.table[i] += count
+        return self
+
+    def copy(self):
+        clone = CountMinSketch(self.width, self.depth)
+        clone.table = array('Q', self.table)
+        return clone
+
+    def to_dict(self):
+        return {'width': self.width, 'depth': self.depth, 'table': _encode(self.table.tobytes())}
+
+    @classmethod
+    def from_dict(cls, data):
+        cms = cls(data['width'], data['depth'])
+        cms.table = array('Q')
+        cms.table.frombytes(base64.b64decode(data['table']))
+        return cms
+
+
+class HeavyHitters:
+    """Top-k tracker: Count-Min estimates plus a small candidate set"""
+
+    def __init__(self, k=10, width=2048, depth=4, capacity_factor=4):
+        self.k = k
+        self.capacity = k * capacity_factor
+        self.sketch = CountMinSketch(width, depth)
+        self.candidates = {}
+
+    def add(self, value, count=1):
+        estimate = self.sketch.add(value, count)
+        if value in self.candidates or len(self.candidates) < self.capacity:
+            self.candidates[value] = estimate
+            return
+        weakest = min(self.candidates, key=self.candidates.get)
+        if estimate > self.candidates[weakest]:
+            del self.candidates[weakest]
+            self.candidates[value] = estimate
+
+    def top(self, n=None):
+        ranked = sorted(self.candidates.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:n or self.k]
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        for value in set(self.candidates) | set(other.candidates):
+            self.candidates[value] = self.sketch.estimate(value)
+        if len(self.candidates) > self.capacity:
+            self.candidates = dict(self.top(self.capacity))
+        return self
+
+    def copy(self):
+        clone = HeavyHitters(self.k, self.sketch.width, self.sketch.depth)
+        clone.capacity = self.capacity
+        clone.sketch = self.sketch.copy()
+        clone.candidates = dict(self.candidates)
+        return clone
+
+    def to_dict(self):
+        return {'k': self.k, 'capacity': self.capacity, 'sketch': self.sketch.to_dict(),
+                'candidates': self.candidates}
+
+    @classmethod
+    def from_dict(cls, data):
+        hh = cls(data['k'])
+        hh.capacity = data['capacity']
+        hh.sketch = CountMinSketch.from_dict(data['sketch'])
+        hh.candidates = dict(data['candidates'])
+        return hh
+
+
+class AttackSketches:
+    """All streaming summaries maintained for incoming attacks"""
+
+    def __init__(self, k=10, window_seconds=3600, windows=24, precision=14):
+        self.k = k
+        self.window_seconds = window_seconds
+        self.max_windows = windows
+        self.precision = precision
+        self.unique_ips = HyperLogLog(precision)
+        self.heavy = self._new_heavy()
+        # Each window: {'start', 'unique_ips', 'heavy'} for the window starting at 'start'
+        self.windows = deque(maxlen=windows)
+        self.last_attack_id = 0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def _new_heavy(self):
+        return {
+            'source_ip': HeavyHitters(self.k),
+            'path': HeavyHitters(self.k),
+            'payload_hash': HeavyHitters(self.k)
+        }
+
+    def _new_window(self, start):
+        return {'start': start, 'unique_ips': HyperLogLog(self.precision), 'heavy': self._new_heavy()}
+
+    def _window_for(self, now):
+        """Window covering now; None for rows too old to place without evicting a newer window"""
+        start = int(now // self.window_seconds * self.window_seconds)
+        if not self.windows or start > self.windows[-1]['start']:
+            self.windows.append(self._new_window(start))
+            return self.windows[-1]
+        # Out-of-order rows (e.g. replaying a bulk import) merge into their window or fill a gap
+        for position, window in enumerate(self.windows):
+            if window['start'] == start:
+                return window
+            if window['start'] > start:
+                if len(self.windows) == self.max_windows or \
+                        start <= self.windows[-1]['start'] - self.window_seconds * self.max_windows:
+                    return None
+                self.windows.insert(position, self._new_window(start))
+                return self.windows[position]
+        return None
+
+    def update(self, attack_data, attack_id=None, now=None):
+        source_ip = attack_data.get('source_ip') or ''
+        path = attack_data.get('path') or ''
+        payload_hash = hashlib.sha256((attack_data.get('payload') or '').encode()).hexdigest()[:16]
+
+        with self._lock:
+            window = self._window_for(now if now is not None else time.time())
+            self.unique_ips.add(source_ip)
+            for field, value in (('source_ip', source_ip), ('path', path), ('payload_hash', payload_hash)):
+                self.heavy[field].add(value)
+                if window is not None:
+                    window['heavy'][field].add(value)
+            if window is not None:
+                window['unique_ips'].add(source_ip)
+            self.total += 1
+            if attack_id is not None and attack_id > self.last_attack_id:
+                self.last_attack_id = attack_id
+
+    def _recent_windows(self, seconds):
+        cutoff = time.time() - seconds
+        return [w for w in self.windows if w['start'] + self.window_seconds > cutoff]
+
+    def unique_ip_count(self, seconds=None):
+        with self._lock:
+            if seconds is None:
+                return self.unique_ips.count()
+            merged = HyperLogLog(self.precision)
+            for window in self._recent_windows(seconds):
+                merged.merge(window['unique_ips'])
+            return merged.count()
+
+    def top(self, field='source_ip', n=None, seconds=None):
+        with self._lock:
+            if seconds is None:
+                return self.heavy[field].top(n)
+            merged = HeavyHitters(self.k)
+            for window in self._recent_windows(seconds):
+                merged.merge(window['heavy'][field])
+            return merged.top(n)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'k': self.k,
+                'window_seconds': self.window_seconds,
+                'max_windows': self.max_windows,
+                'precision': self.precision,
+                'last_attack_id': self.last_attack_id,
+                'total': self.total,
+                'unique_ips': self.unique_ips.to_dict(),
+                'heavy': {field: hh.to_dict() for field, hh in self.heavy.items()},
+                'windows': [
+                    {
+                        'start': w['start'],
+                        'unique_ips': w['unique_ips'].to_dict(),
+                        'heavy': {field: hh.to_dict() for field, hh in w['heavy'].items()}
+                    }
+                    for w in self.windows
+                ]
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketches = cls(data['k'], data['window_seconds'], data['max_windows'], data['precision'])
+        sketches.last_attack_id = data['last_attack_id']
+        sketches.total = data['total']
+        sketches.unique_ips = HyperLogLog.from_dict(data['unique_ips'])
+        sketches.heavy = {field: HeavyHitters.from_dict(hh) for field, hh in data['heavy'].items()}
+        for w in data['windows']:
+            window = sketches._new_window(w['start'])
+            window['unique_ips'] = HyperLogLog.from_dict(w['unique_ips'])
+            # Older checkpoints only kept source_ip per window; the other fields start empty
+            window['heavy'].update({field: HeavyHitters.from_dict(hh) for field, hh in w['heavy'].items()})
+            sketches.windows.append(window)
+        return sketches
+
+    def checkpoint(self, path):
+        """Atomically write the sketch state to disk"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
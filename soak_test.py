@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+⏳ Long-running soak test with memory and latency drift tracking
+Drives the server with simulated ESP32 events at a fixed rate for hours,
+either in-process (a threaded server started here, so tracemalloc can see its
+allocations) or against a running instance with --url. Every interval it
+records RSS, traced memory, chain length, database size and latency
+percentiles, then reports growth rates and the allocation sites that grew
+most. Sends are dispatched to a pool of sender threads on a fixed schedule and
+their latency is measured from the scheduled send time, so a slow server shows
+up as queueing latency instead of a lower send rate. Exits non-zero if memory
+or p99 latency grew beyond the thresholds, or the target rate was not reached.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from simulate_esp32 import ESP32AttackSimulator
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def read_rss(pid=None):
+    """Resident set size in bytes, or None where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        if pid is None:
+            import resource
+            # ru_maxrss is a peak, not current, but still catches steady growth
+            scale = 1 if sys.platform == 'darwin' else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        return None
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else None
+
+
+def slope_per_hour(points):
+    """Least-squares slope of [(seconds, value), ...] in value units per hour"""
+    points = [(t, v) for t, v in points if v is not None]
+    if len(points) < 2:
+        return None
+    mean_t = sum(t for t, _ in points) / len(points)
+    mean_v = sum(v for _, v in points) / len(points)
+    spread = sum((t - mean_t) ** 2 for t, _ in points)
+    if not spread:
+        return None
+    return sum((t - mean_t) * (v - mean_v) for t, v in points) / spread * 3600
+
+
+def start_in_process_server(workdir, verbose=False):
+    """Initialize server_enhanced inside workdir and serve it on a free local port"""
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)  # Database, feature store, sketches and archives all use relative paths
+
+    import server_enhanced
+    from werkzeug.serving import make_server
+
+    if not verbose:
+        server_enhanced.logger.setLevel(logging.WARNING)
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server_enhanced.initialize_system()
+
+    server = make_server('127.0.0.1', 0, server_enhanced.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='soak-server', daemon=True).start()
+    return server_enhanced, f"http://127.0.0.1:{server.server_port}"
+
+
+class SoakRun:
+    """Open-loop load at a fixed rate plus periodic sampling of the server's footprint"""
+
+    def __init__(self, base_url, rate, interval, poll_interval, server=None, pid=None, db_path=None,
+                 top=10, senders=32):
+        self.base_url = base_url.rstrip('/')
+        self.rate = rate
+        self.interval = interval
+        self.poll_interval = poll_interval
+        self.server = server  # server_enhanced module when running in-process
+        self.pid = pid
+        self.db_path = db_path
+        self.top = top
+        self.simulator = ESP32AttackSimulator(server_url=f"{self.base_url}/attack")
+        self.session = requests.Session()  # Main thread only; senders each get their own
+        self.local = threading.local()
+        self.senders = senders
+        self.lock = threading.Lock()  # Guards latencies and the counters updated by sender threads
+        self.latencies = []
+        self.in_flight = 0
+        self.samples = []
+        self.sent = self.errors = self.missed = 0
+        self.baseline_snapshot = None
+        self.started = None
+
+    def send_attack(self, scheduled):
+        """Sender thread: latency counts from the scheduled send time, including any wait for a free sender"""
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        try:
+            response = session.post(f"{self.base_url}/attack", json=self.simulator.random_attack_data(),
+                                    timeout=10)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        seconds = time.perf_counter() - scheduled
+        with self.lock:
+            self.latencies.append(seconds)
+            self.sent += 1
+            self.errors += not ok
+            self.in_flight -= 1
+
+    def take_latencies(self):
+        with self.lock:
+            latencies, self.latencies = self.latencies, []
+        return latencies
+
+    def poll_dashboard(self):
+        """What an open dashboard costs the server: one /stats fetch per refresh"""
+        started = time.perf_counter()
+        try:
+            ok = self.session.get(f"{self.base_url}/stats", timeout=30).status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    def chain_length(self):
+        if self.server is not None:
+            return self.server.chain_block_count()
+        try:
+            health = self.session.get(f"{self.base_url}/health", timeout=10).json()
+            return int(health['system']['blockchain'].split()[0])
+        except (requests.RequestException, ValueError, KeyError, IndexError):
+            return None
+
+    def db_size(self):
+        if not self.db_path:
+            return None
+        return sum(os.path.getsize(path) for path in (self.db_path, f"{self.db_path}-wal")
+                   if os.path.exists(path))
+
+    def sample(self, elapsed, latencies, poll_latencies):
+        traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        rss = read_rss(self.pid)
+        record = {
+            'elapsed': round(elapsed, 1),
+            'sent': self.sent,
+            'errors': self.errors,
+            'rate': round(len(latencies) / self.interval, 2),
+            'p50_ms': _ms(percentile(latencies, 0.50)),
+            'p95_ms': _ms(percentile(latencies, 0.95)),
+            'p99_ms': _ms(percentile(latencies, 0.99)),
+            'max_ms': _ms(max(latencies) if latencies else None),
+            'stats_p99_ms': _ms(percentile(poll_latencies, 0.99)),
+            'rss_mb': _mb(rss),
+            'traced_mb': _mb(traced),
+            'chain_blocks': self.chain_length(),
+            'db_mb': _mb(self.db_size())
+        }
+        self.samples.append(record)
+        shown = {key: '-' if value is None else value for key, value in record.items()}
+        record['missed'] = self.missed
+        print(f"📈 {record['elapsed']:>8.0f}s  sent {self.sent:>8}  err {self.errors:>4}  missed {self.missed:>4}  "
+              f"p50 {shown['p50_ms']}ms  p99 {shown['p99_ms']}ms  /stats p99 {shown['stats_p99_ms']}ms  "
+              f"rss {shown['rss_mb']}MB  traced {shown['traced_mb']}MB  "
+              f"chain {shown['chain_blocks']}  db {shown['db_mb']}MB")
+        return record
+
+    def run(self, duration, warmup):
+        pool = ThreadPoolExecutor(max_workers=self.senders, thread_name_prefix='soak-sender')
+        try:
+            self._run(pool, duration, warmup)
+        finally:
+            pool.shutdown(wait=True)
+
+    def _run(self, pool, duration, warmup):
+        self.started = time.perf_counter()
+        period = 1.0 / self.rate
+        next_send = self.started
+        next_sample = self.started + self.interval
+        next_poll = self.started + self.poll_interval
+        warmup_done = warmup <= 0
+        if warmup_done and tracemalloc.is_tracing():
+            self.baseline_snapshot = tracemalloc.take_snapshot()
+
+        poll_latencies = []
+        backlog_limit = self.senders * 4
+        end = self.started + duration
+        while True:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            if not warmup_done and now - self.started >= warmup:
+                # Caches, buffers and lazily-loaded modules settle during warm-up; measure growth after it
+                warmup_done = True
+                if tracemalloc.is_tracing():
+                    self.baseline_snapshot = tracemalloc.take_snapshot()
+                print(f"🔥 Warm-up finished after {warmup:.0f}s; growth is measured from here")
+            if now >= next_sample:
+                record = self.sample(now - self.started, self.take_latencies(), poll_latencies)
+                record['warmup'] = not warmup_done
+                poll_latencies = []
+                next_sample += self.interval
+                continue
+            if now >= next_poll:
+                seconds, ok = self.poll_dashboard()
+                poll_latencies.append(seconds)
+                with self.lock:
+                    self.errors += not ok
+                next_poll += self.poll_interval
+                continue
+            if now < next_send:
+                time.sleep(min(next_send, next_sample, next_poll) - now)
+                continue
+
+            # Open loop: the schedule does not slow down when the server does. A backlog beyond a few
+            # requests per sender is dropped and counted rather than queued without bound.
+            with self.lock:
+                backlogged = self.in_flight >= backlog_limit
+                if not backlogged:
+                    self.in_flight += 1
+            if backlogged:
+                self.missed += 1
+            else:
+                pool.submit(self.send_attack, next_send)
+            next_send += period
+
+    def top_growth(self):
+        """Allocation sites that grew most since the end of warm-up"""
+        if self.baseline_snapshot is None or not tracemalloc.is_tracing():
+            return []
+        filters = [tracemalloc.Filter(False, pattern) for pattern in
+                   (tracemalloc.__file__, '<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>', '<unknown>')]
+        snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+        baseline = self.baseline_snapshot.filter_traces(filters)
+        return [
+            {'site': str(stat.traceback), 'size_diff_kb': round(stat.size_diff / 1024, 1), 'count_diff': stat.count_diff}
+            for stat in snapshot.compare_to(baseline, 'lineno')[:self.top] if stat.size_diff > 0
+        ]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def _mb(size):
+    return round(size / 1024 / 1024, 2) if size is not None else None
+
+
+def window_median(samples, key, from_end=False, width=3):
+    values = [s[key] for s in (samples[-width:] if from_end else samples[:width]) if s[key] is not None]
+    return sorted(values)[len(values) // 2] if values else None
+
+
+def evaluate(samples, max_memory_growth, max_p99_growth, achieved_rate=None, target_rate=None, min_rate=0.9):
+    """Growth rates over the post-warm-up samples and the list of threshold violations"""
+    measured = [s for s in samples if not s.get('warmup')]
+    growth = {
+        'rss_mb_per_hour': slope_per_hour([(s['elapsed'], s['rss_mb']) for s in measured]),
+        'traced_mb_per_hour': slope_per_hour([(s['elapsed'], s['traced_mb']) for s in measured]),
+        'p99_ms_per_hour': slope_per_hour([(s['elapsed'], s['p99_ms']) for s in measured]),
+        'chain_blocks_per_hour': slope_per_hour([(s['elapsed'], s['chain_blocks']) for s in measured]),
+        'db_mb_per_hour': slope_per_hour([(s['elapsed'], s['db_mb']) for s in measured])
+    }
+    first_p99, last_p99 = window_median(measured, 'p99_ms'), window_median(measured, 'p99_ms', from_end=True)
+    growth['p99_ratio'] = round(last_p99 / first_p99, 3) if first_p99 and last_p99 else None
+
+    failures = []
+    if achieved_rate is not None and target_rate and achieved_rate < min_rate * target_rate:
+        failures.append(f"achieved {achieved_rate:.1f} attacks/sec of the {target_rate:g} targeted "
+                        f"(limit {min_rate:.0%}); the server could not keep up with the schedule")
+    if len(measured) < 2:
+        failures.append("fewer than 2 samples after warm-up; run longer or shorten --interval")
+        return growth, failures
+    memory = growth['rss_mb_per_hour'] if growth['rss_mb_per_hour'] is not None else growth['traced_mb_per_hour']
+    if memory is not None and memory > max_memory_growth:
+        failures.append(f"memory grows {memory:.1f} MB/hour (limit {max_memory_growth})")
+    if growth['p99_ratio'] is not None and growth['p99_ratio'] > max_p99_growth:
+        failures.append(f"p99 latency grew {growth['p99_ratio']:.2f}x (limit {max_p99_growth}x)")
+    return growth, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Soak test the honeypot server for memory and latency drift')
+    parser.add_argument('--url', help='Test a running server (default: start one in-process)')
+    parser.add_argument('--pid', type=int, help='PID of the --url server, to track its RSS')
+    parser.add_argument('--db', help='Database file of the --url server, to track its size')
+    parser.add_argument('--workdir', help='Working directory for the in-process server (default: a temp dir)')
+    parser.add_argument('--duration', type=float, default=3600, help='Seconds to run')
+    parser.add_argument('--rate', type=float, default=20, help='Attacks per second')
+    parser.add_argument('--senders', type=int, default=32, help='Concurrent sender threads')
+    parser.add_argument('--min-rate', type=float, default=0.9,
+                        help='Fail if fewer than this fraction of the target rate completed')
+    parser.add_argument('--interval', type=float, default=60, help='Seconds between samples')
+    parser.add_argument('--warmup', type=float, default=120, help='Seconds excluded from growth measurements')
+    parser.add_argument('--poll-interval', type=float, default=5, help='Seconds between dashboard /stats polls')
+    parser.add_argument('--max-memory-growth', type=float, default=50, help='Fail above this many MB/hour')
+    parser.add_argument('--max-p99-growth', type=float, default=2.0,
+                        help='Fail if the last samples\' p99 exceeds the first post-warm-up p99 by this factor')
+    parser.add_argument('--no-tracemalloc', action='store_true', help='Skip allocation tracing (lower overhead)')
+    parser.add_argument('--top', type=int, default=10, help='Allocation sites to report')
+    parser.add_argument('--report', help='Write samples, growth rates and allocation sites as JSON')
+    parser.add_argument('--verbose', action='store_true', help='Keep the in-process server\'s INFO logging')
+    args = parser.parse_args()
+
+    server = None
+    db_path = args.db
+    if args.url:
+        base_url = args.url
+        if args.pid is None:
+            print("ℹ️  Allocation tracing needs the in-process mode; pass --pid to track the server's RSS")
+    else:
+        if not args.no_tracemalloc:
+            tracemalloc.start()
+        workdir = args.workdir or tempfile.mkdtemp(prefix='soak_')
+        server, base_url = start_in_process_server(workdir, args.verbose)
+        db_path = os.path.abspath(server.DATABASE_PATH)
+        print(f"🧪 In-process server on {base_url} (workdir {workdir})")
+
+    run = SoakRun(base_url, args.rate, args.interval, args.poll_interval, server=server,
+                  pid=args.pid, db_path=db_path, top=args.top, senders=args.senders)
+    print(f"⏳ Soaking {base_url} at {args.rate:g} attacks/sec for {args.duration:.0f}s "
+          f"(samples every {args.interval:g}s, warm-up {args.warmup:g}s)")
+    try:
+        run.run(args.duration, args.warmup)
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrupted - reporting on the samples so far")
+
+    elapsed = time.perf_counter() - run.started if run.started else 0
+    achieved_rate = run.sent / elapsed if elapsed else None
+    growth, failures = evaluate(run.samples, args.max_memory_growth, args.max_p99_growth,
+                                achieved_rate, args.rate, args.min_rate)
+    allocations = run.top_growth()
+
+    print("=" * 60)
+    print(f"📊 {run.sent} attacks sent, {run.errors} errors, {run.missed} missed, {len(run.samples)} samples"
+          f" ({achieved_rate or 0:.1f}/sec of {args.rate:g} targeted)")
+    for name, value in growth.items():
+        print(f"   • {name}: {value if value is None else round(value, 3)}")
+    if allocations:
+        print("🔎 Top allocation growth since warm-up:")
+        for site in allocations:
+            print(f"   • {site['site']}: +{site['size_diff_kb']} KB ({site['count_diff']:+d} blocks)")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'samples': run.samples, 'growth': growth, 'allocations': allocations,
+                       'failures': failures, 'sent': run.sent, 'errors': run.errors, 'missed': run.missed,
+                       'achieved_rate': achieved_rate}, f, indent=2)
+        print(f"💾 Report written to {args.report}")
+
+    if failures:
+        print("❌ Soak test FAILED:")
+        for failure in failures:
+            print(f"   • {failure}")
+        sys.exit(1)
+    print("✅ Target rate held with no memory or latency drift beyond the thresholds")
+
+
+if __name__ == '__main__':
+    main()
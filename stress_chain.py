@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+⛓️ Concurrent chain append stress test
+Hammers add_block (or the full /attack pipeline) from many threads and checks
+that the resulting chain is a single, gap-free, verifiable sequence. With
+--device-chains each thread is its own device, appending to its own chain,
+and the run ends with a global anchor block over all device heads.
+Exits non-zero if the chain forked or failed verification.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import server_enhanced
+
+
+def check_chain(expected_blocks, chain=None):
+    """Return a list of problems found in one chain (server_enhanced.blockchain by default)"""
+    chain = server_enhanced.blockchain if chain is None else chain
+    problems = []
+    if len(chain) != expected_blocks:
+        problems.append(f"expected {expected_blocks} blocks, found {len(chain)}")
+    for position, block in enumerate(chain):
+        if block.index != position:
+            problems.append(f"block at position {position} has index {block.index}")
+            break
+    parents = [block.previous_hash for block in chain[1:]]
+    if len(parents) != len(set(parents)):
+        problems.append(f"{len(parents) - len(set(parents))} blocks share a parent (chain forked)")
+    if not server_enhanced.verify_chain(chain):
+        problems.append("chain verification failed")
+    return problems
+
+
+def run_stress(threads=32, per_thread=500, full_pipeline=False, device_chains=False):
+    server_enhanced.blockchain.clear()
+    server_enhanced.blockchain.append(server_enhanced.create_genesis_block())
+    server_enhanced.device_chains.clear()
+    server_enhanced.CHAIN_MODE = 'device' if device_chains else 'global'
+
+    # Switch threads far more often than the default 5ms to provoke interleavings
+    sys.setswitchinterval(1e-6)
+
+    if full_pipeline:
+        workdir = tempfile.mkdtemp(prefix='stress_chain_')
+        server_enhanced.DATABASE_PATH = os.path.join(workdir, 'stress.db')
+        server_enhanced.init_database()
+
+    start_barrier = threading.Barrier(threads)
+    errors = []
+
+    def worker(worker_id):
+        local_client = server_enhanced.app.test_client() if full_pipeline else None
+        start_barrier.wait()
+        for i in range(per_thread):
+            data = {
+                'device_id': f'STRESS_{worker_id:03d}',
+                'timestamp': int(time.time() * 1000),
+                'attack_type': 'stress_test',
+                'source_ip': f'10.0.{worker_id % 256}.{i % 256}',
+                'path': '/stress',
+                'payload': f'worker={worker_id}&seq={i}'
+            }
+            try:
+                if full_pipeline:
+                    response = local_client.post('/attack', json=data)
+                    if response.status_code != 200:
+                        errors.append(response.get_json())
+                elif server_enhanced.add_block(data) is None:
+                    errors.append('add_block returned None')
+            except Exception as e:
+                errors.append(str(e))
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    total = threads * per_thread
+    if device_chains:
+        problems = []
+        for device_id, chain in server_enhanced.device_chains.items():
+            problems += [f"{device_id}: {p}" for p in check_chain(per_thread + 1, chain)]
+        if server_enhanced.anchor_device_chains() is None:
+            problems.append("no anchor block was committed")
+        if not server_enhanced.verify_blockchain():
+            problems.append("verify_blockchain() failed (chains or anchors)")
+    else:
+        problems = check_chain(total + 1)
+        if not server_enhanced.verify_blockchain():
+            problems.append("verify_blockchain() failed")
+    problems += [f"append error: {e}" for e in errors[:5]]
+
+    print(f"⛓️  {total} appends from {threads} threads in {elapsed:.2f}s ({total / elapsed:.0f} blocks/sec)")
+    if problems:
+        print("❌ Chain integrity check FAILED:")
+        for problem in problems:
+            print(f"   • {problem}")
+    else:
+        print(f"✅ Chain verified: {server_enhanced.chain_block_count()} blocks, no forks")
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stress concurrent blockchain appends')
+    parser.add_argument('--threads', type=int, default=32, help='Concurrent appending threads')
+    parser.add_argument('--per-thread', type=int, default=500, help='Appends per thread')
+    parser.add_argument('--full', action='store_true',
+                        help='Go through /attack (ML, SQLite, indexes) instead of add_block only')
+    parser.add_argument('--device-chains', action='store_true',
+                        help='One chain per device (one device per thread) plus a global anchor block')
+    args = parser.parse_args()
+
+    ok = run_stress(args.threads, args.per_thread, args.full, args.device_chains)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
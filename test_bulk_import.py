@@ -0,0 +1,66 @@
+import json
+import sqlite3
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+import bulk_import
+import server_enhanced
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(server_enhanced, 'blockchain', [])
+    return tmp_path
+
+
+@pytest.fixture
+def model_path(workdir):
+    rng = np.random.default_rng(0)
+    X = rng.random((40, server_enhanced.N_FEATURES))
+    labels = ['scan', 'brute_force'] * 20
+    encoder = LabelEncoder().fit(labels)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(scaler.transform(X), encoder.transform(labels))
+    path = workdir / 'model.pkl'
+    joblib.dump({'model': model, 'scaler': scaler, 'label_encoder': encoder, 'model_name': 'RF',
+                 'accuracy': 1.0, 'feature_names': []}, path)
+    return str(path)
+
+
+def write_dump(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines))
+    return str(path)
+
+
+def test_trailing_batch_of_skipped_records(workdir, model_path):
+    records = [json.dumps({'source_ip': f'10.0.0.{i}', 'path': f'/p{i}'}) for i in range(10)]
+    dump = write_dump(workdir / 'dump.ndjson', records + ['{not json', json.dumps({'device_id': 'only'})])
+
+    imported = bulk_import.bulk_import(dump, str(workdir / 'h.db'), model_path, batch_size=10, workers=2)
+
+    assert imported == 10
+    conn = sqlite3.connect(workdir / 'h.db')
+    assert conn.execute('SELECT records, imported, skipped FROM import_checkpoints').fetchone() == (12, 10, 2)
+    assert bulk_import.verify_import_blocks(conn) == []
+
+
+@pytest.mark.parametrize('value, expected', [
+    (1700000000, '2023-11-14 22:13:20'),
+    (1700000000000, '2023-11-14 22:13:20'),
+    ('2023-11-14T23:13:20+01:00', '2023-11-14 22:13:20'),
+    ('inf', None),
+    ('1e20', None),
+    ('yesterday', None),
+])
+def test_normalize_created_at(value, expected):
+    assert bulk_import.normalize_created_at(value) == expected
+
+
+def test_unparseable_created_at_is_skipped():
+    assert bulk_import.normalize({'source_ip': '1.2.3.4', 'created_at': '1e20'}, {}) is None
+    assert bulk_import.normalize({'source_ip': '1.2.3.4'}, {}) == ({'source_ip': '1.2.3.4'}, None)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Wire formats for device uploads
+Decodes JSON, MessagePack or CBOR request bodies (selected by Content-Type),
+optionally gzip/deflate compressed (Content-Encoding), and encodes the same
+formats for clients such as the ESP32 simulator. MessagePack and CBOR are
+optional dependencies; JSON always works.
+"""
+
+import json
+import zlib
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+MAX_BODY_BYTES = 16 * 1024 * 1024  # Cap on decompressed size
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'msgpack': 'application/msgpack',
+    'cbor': 'application/cbor'
+}
+
+_FORMAT_BY_CONTENT_TYPE = {
+    'application/json': 'json',
+    'text/json': 'json',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.msgpack': 'msgpack',
+    'application/cbor': 'cbor'
+}
+
+
+class UnsupportedFormat(ValueError):
+    """Body format or encoding the server cannot decode"""
+
+
+def available_formats():
+    return [fmt for fmt in CONTENT_TYPES if fmt == 'json' or
+            (fmt == 'msgpack' and msgpack) or (fmt == 'cbor' and cbor2)]
+
+
+def format_for_content_type(content_type):
+    """Map a Content-Type header to a format name; missing headers default to JSON"""
+    mime = (content_type or '').split(';')[0].strip().lower()
+    if not mime:
+        return 'json'
+    fmt = _FORMAT_BY_CONTENT_TYPE.get(mime)
+    if fmt is None:
+        raise UnsupportedFormat(f"Unsupported Content-Type: {mime}")
+    return fmt
+
+
+def decompress(body, content_encoding):
+    encoding = (content_encoding or 'identity').strip().lower()
+    if encoding == 'identity':
+        return body
+    if encoding in ('gzip', 'x-gzip'):
+        wbits = 16 + zlib.MAX_WBITS
+    elif encoding == 'deflate':
+        wbits = 32 + zlib.MAX_WBITS  # Accept zlib-wrapped or gzip; raw deflate is handled below
+    else:
+        raise UnsupportedFormat(f"Unsupported Content-Encoding: {encoding}")
+
+    try:
+        decompressor = zlib.decompressobj(wbits)
+        data = decompressor.decompress(body, MAX_BODY_BYTES)
+    except zlib.error:
+        if encoding != 'deflate':
+            raise
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        data = decompressor.decompress(body, MAX_BODY_BYTES)
+    if decompressor.unconsumed_tail:
+        raise UnsupportedFormat(f"Decompressed body exceeds {MAX_BODY_BYTES} bytes")
+    return data
+
+
+def decode_body(body, content_type=None, content_encoding=None):
+    """Decode a raw request body into Python objects"""
+    fmt = format_for_content_type(content_type)
+    data = decompress(body, content_encoding)
+    if not data:
+        return None
+
+    if fmt == 'json':
+        return json.loads(data)
+    if fmt == 'msgpack':
+        if msgpack is None:
+            raise UnsupportedFormat("MessagePack support requires the 'msgpack' package")
+        return msgpack.unpackb(data, raw=False)
+    if cbor2 is None:
+        raise UnsupportedFormat("CBOR support requires the 'cbor2' package")
+    return cbor2.loads(data)
+
+
+def encode_body(obj, fmt='json', compression=None):
+    """Encode obj for upload; returns (body_bytes, headers)"""
+    if fmt == 'json':
+        data = json.dumps(obj, separators=(',', ':')).encode()
+    elif fmt == 'msgpack':
+        if msgpack is None:
+            raise UnsupportedFormat("MessagePack support requires the 'msgpack' package")
+        data = msgpack.packb(obj, use_bin_type=True)
+    elif fmt == 'cbor':
+        if cbor2 is None:
+            raise UnsupportedFormat("CBOR support requires the 'cbor2' package")
+        data = cbor2.dumps(obj)
+    else:
+        raise UnsupportedFormat(f"Unknown format: {fmt}")
+
+    headers = {'Content-Type': CONTENT_TYPES[fmt]}
+    if compression == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        data = compressor.compress(data) + compressor.flush()
+        headers['Content-Encoding'] = 'gzip'
+    elif compression == 'deflate':
+        data = zlib.compress(data, 6)
+        headers['Content-Encoding'] = 'deflate'
+    elif compression:
+        raise UnsupportedFormat(f"Unknown compression: {compression}")
+    return data, headers